@@ -0,0 +1,20 @@
+"""
+Celery application for the chess_mate project.
+
+Start a worker with:
+    celery -A chess_mate worker -l info
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chess_mate.settings')
+
+app = Celery('chess_mate')
+
+# Read CELERY_* settings from Django settings
+app.config_from_object('django.conf:settings', namespace='CELERY')
+
+# Discover tasks.py modules in installed apps
+app.autodiscover_tasks()
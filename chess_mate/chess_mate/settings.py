@@ -50,6 +50,7 @@ INSTALLED_APPS = [
     "rest_framework",
     "rest_framework_simplejwt",
     'rest_framework_simplejwt.token_blacklist',  # Add this line
+    'cachalot',
 ]
 
 MIDDLEWARE = [
@@ -98,6 +99,9 @@ if TESTING:
         }
     }
 else:
+    # Behind PgBouncer in transaction pooling mode the bouncer owns the pool: connections are closed
+    # after each request and server-side cursors, which do not survive a transaction, are disabled
+    DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', 'False').lower() == 'true'
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.postgresql',
@@ -106,7 +110,9 @@ else:
             'PASSWORD': os.getenv('DB_PASSWORD', ''),
             'HOST': os.getenv('DB_HOST', 'localhost'),
             'PORT': os.getenv('DB_PORT', '5432'),
-            'CONN_MAX_AGE': 600,  # 10 minutes connection persistence
+            'CONN_MAX_AGE': 0 if DB_PGBOUNCER else 600,  # 10 minutes connection persistence
+            'CONN_HEALTH_CHECKS': True,  # Replace persistent connections the server has dropped
+            'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
             'OPTIONS': {
                 'connect_timeout': 10,
                 'client_encoding': 'UTF8'
@@ -222,6 +228,10 @@ CSRF_TRUSTED_ORIGINS = [
 
 # Stockfish configuration
 STOCKFISH_PATH = os.getenv('STOCKFISH_PATH', 'stockfish')  # Default to system-installed Stockfish
+STOCKFISH_THREADS_PER_ENGINE = int(os.getenv('STOCKFISH_THREADS_PER_ENGINE', 1))
+STOCKFISH_HASH_MB = int(os.getenv('STOCKFISH_HASH_MB', 256))  # Transposition table size per engine
+ENGINE_POOL_SIZE = int(os.getenv('ENGINE_POOL_SIZE', 0)) or None  # Defaults to cpu_count // threads per engine
+ENGINE_ACQUIRE_TIMEOUT = float(os.getenv('ENGINE_ACQUIRE_TIMEOUT', 10))  # Seconds a request waits for a free engine
 
 
 # REST Framework settings
@@ -255,21 +265,26 @@ if not TESTING and not all([EMAIL_HOST_USER, EMAIL_HOST_PASSWORD, DEFAULT_FROM_E
 # Stripe Configuration
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
 STRIPE_PUBLIC_KEY = os.getenv('STRIPE_PUBLIC_KEY')
+STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
+# Fetch checkout sessions with a plain HTTP call instead of the Stripe SDK object layer
+STRIPE_RAW_SESSION_FETCH = os.getenv('STRIPE_RAW_SESSION_FETCH', 'False').lower() == 'true'
 PAYMENT_SUCCESS_URL = os.getenv('PAYMENT_SUCCESS_URL', 'http://localhost:3000/payment/success')
 PAYMENT_CANCEL_URL = os.getenv('PAYMENT_CANCEL_URL', 'http://localhost:3000/payment/cancel')
 
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'handlers': {
         'console': {
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
             'class': 'logging.StreamHandler',
         },
     },
     'root': {
         'handlers': ['console'],
-        'level': 'DEBUG',
+        'level': LOG_LEVEL,
     },
 }
 
@@ -291,6 +306,48 @@ REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 if os.getenv('REDIS_CLOUD_URL'):
     REDIS_URL = os.getenv('REDIS_CLOUD_URL')
 
+# Cache Configuration
+if TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# ORM query caching, invalidated automatically on writes
+CACHALOT_ENABLED = not TESTING
+CACHALOT_CACHE = 'default'
+CACHALOT_TIMEOUT = 60 * 15
+# Only the read-heavy dashboard tables; token blacklist and payment tables must always hit the database
+CACHALOT_ONLY_CACHABLE_TABLES = frozenset(('games', 'core_profile'))
+
+# Celery Configuration
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', REDIS_URL)
+CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', REDIS_URL)
+CELERY_ACCEPT_CONTENT = ['json']
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_RESULT_SERIALIZER = 'json'
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_TASK_ACKS_LATE = True  # Re-deliver tasks if a worker dies mid-analysis
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # Analysis tasks are long-running, don't hoard them
+# Stockfish work runs on its own CPU-bound workers so it cannot starve imports, payments and email;
+# SMTP sends get a small I/O-bound pool of their own
+CELERY_TASK_ROUTES = {
+    'core.tasks.analyze_game_task': {'queue': 'analysis'},
+    'core.tasks.batch_analyze_task': {'queue': 'analysis'},
+    'core.tasks.analyze_batch_games_task': {'queue': 'analysis'},
+    'core.tasks.send_verification_email_task': {'queue': 'email'},
+}
+CELERY_TASK_ALWAYS_EAGER = TESTING  # Run tasks inline during tests
+CELERY_TASK_EAGER_PROPAGATES = TESTING
+
 # Rate Limiting Settings
 RATE_LIMIT = {
     'DEFAULT': {
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Player, Game, GameAnalysis, Profile, Transaction
+from .models import Player, Game, GameAnalysis, Profile, Transaction, AnalysisJob, CreditedPayment
 
 @admin.register(Player)
 class PlayerAdmin(admin.ModelAdmin):
@@ -27,4 +27,15 @@ class GameAnalysisAdmin(admin.ModelAdmin):
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ('user', 'transaction_type', 'credits', 'status', 'created_at')
     list_filter = ('transaction_type', 'status')
-    search_fields = ('user__username', 'stripe_payment_id')
\ No newline at end of file
+    search_fields = ('user__username', 'stripe_payment_id')
+
+@admin.register(AnalysisJob)
+class AnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ('user', 'job_type', 'status', 'game', 'created_at')
+    list_filter = ('job_type', 'status')
+    search_fields = ('user__username',)
+
+@admin.register(CreditedPayment)
+class CreditedPaymentAdmin(admin.ModelAdmin):
+    list_display = ('session_id', 'user', 'credits', 'created_at')
+    search_fields = ('session_id', 'user__username')
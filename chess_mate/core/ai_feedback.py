@@ -1,10 +1,33 @@
 import os
+import json
+import hashlib
+from functools import lru_cache
 from openai import OpenAI
+from django.core.cache import cache
 from typing import Dict, List, Any, Optional, TypedDict, Union, Literal
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# Identical prompts produce interchangeable feedback, so completions are reused for a day
+AI_RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+
+def cached_completion(client: OpenAI, **request: Any) -> Optional[str]:
+    """
+    Run a chat completion, returning the stored response text when the exact same
+    request (model, messages and sampling parameters) was made recently.
+    """
+    digest = hashlib.blake2b(json.dumps(request, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+    key = f"openai:{digest}"
+    content = cache.get(key)
+    if content is None:
+        response = client.chat.completions.create(**request)
+        content = response.choices[0].message.content
+        if content:
+            cache.set(key, content, timeout=AI_RESPONSE_CACHE_TIMEOUT)
+    return content
+
 class FeedbackSection(TypedDict):
     analysis: str
     suggestions: List[str]
@@ -62,7 +85,8 @@ class AIFeedbackGenerator:
             prompt = self._create_analysis_prompt(analysis_summary, player_profile)
             
             # Generate feedback using OpenAI
-            response = self.client.chat.completions.create(
+            content = cached_completion(
+                self.client,
                 model="gpt-3.5-turbo",
                 messages=[
                     {
@@ -78,8 +102,6 @@ class AIFeedbackGenerator:
                 temperature=0.7
             )
             
-            # Parse and structure the response
-            content = response.choices[0].message.content
             if not content:
                 logger.warning("Empty response from OpenAI API")
                 return self._generate_fallback_feedback(game_analysis)
@@ -91,6 +113,65 @@ class AIFeedbackGenerator:
             logger.error("Error generating AI feedback: %s", str(e))
             return self._generate_fallback_feedback(game_analysis)
 
+    def generate_batch_feedback(
+        self,
+        game_analyses: Dict[int, List[Dict[str, Any]]],
+        player_profile: Dict[str, Any]
+    ) -> Dict[int, FeedbackData]:
+        """
+        Generate personalized feedback for several games with a single OpenAI request.
+
+        Args:
+            game_analyses: Move analysis data keyed by game id
+            player_profile: Dictionary containing player information
+
+        Returns:
+            Dictionary mapping each game id to its structured feedback
+        """
+        feedback_by_game: Dict[int, FeedbackData] = {}
+        try:
+            if not self.client:
+                logger.warning("OpenAI client not initialized. Using fallback feedback.")
+            elif game_analyses:
+                prompt = self._create_batch_prompt(
+                    {game_id: self._prepare_analysis_summary(analysis) for game_id, analysis in game_analyses.items()},
+                    player_profile
+                )
+                content = cached_completion(
+                    self.client,
+                    model="gpt-3.5-turbo",
+                    response_format={"type": "json_object"},
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are a chess analysis expert providing specific, actionable feedback to help players improve their game. Reply with a JSON object only."
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    max_tokens=min(4000, 500 * len(game_analyses)),
+                    temperature=0.7
+                )
+
+                if not content:
+                    logger.warning("Empty response from OpenAI API")
+                else:
+                    answers = orjson.loads(content).get("feedback_by_game_id", {})
+                    for game_id in game_analyses:
+                        text = answers.get(str(game_id))
+                        if isinstance(text, str) and text.strip():
+                            feedback_by_game[game_id] = self._parse_ai_response(text)
+
+        except Exception as e:
+            logger.error("Error generating batch AI feedback: %s", str(e))
+
+        for game_id, analysis in game_analyses.items():
+            if game_id not in feedback_by_game:
+                feedback_by_game[game_id] = self._generate_fallback_feedback(analysis)
+        return feedback_by_game
+
     def _prepare_analysis_summary(self, game_analysis: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Prepare a summary of the game analysis for the AI prompt."""
         summary: Dict[str, Union[int, List[Dict[str, Any]]]] = {
@@ -156,6 +237,43 @@ Please provide specific, actionable feedback in the following areas:
 6. Specific exercises or study recommendations
 
 Focus on the most critical aspects and provide concrete suggestions for improvement.
+"""
+        return prompt
+
+    def _create_batch_prompt(
+        self,
+        summaries: Dict[int, Dict[str, Any]],
+        player_profile: Dict[str, Any]
+    ) -> str:
+        """Create one prompt covering several games, asking for feedback keyed by game id."""
+        games = [
+            {
+                "game_id": game_id,
+                "total_moves": summary["total_moves"],
+                "critical_positions": len(summary.get("critical_moves", [])),
+                "mistakes": len(summary.get("mistakes", [])),
+                "time_management_issues": len(summary.get("time_management", []))
+            }
+            for game_id, summary in summaries.items()
+        ]
+        prompt = f"""
+Analyze these chess games for {player_profile.get('username', 'Anonymous')} (Rating: {player_profile.get('rating', 'Unrated')})
+Total games played: {player_profile.get('total_games', 0)}
+Preferred openings: {', '.join(player_profile.get('preferred_openings', ['Not specified']))}
+
+Game summaries:
+{orjson.dumps({"games": games}).decode()}
+
+For each game provide specific, actionable feedback in the following areas:
+1. Opening preparation and improvements
+2. Tactical awareness and calculation
+3. Strategic understanding and positional play
+4. Time management
+5. Endgame technique
+6. Specific exercises or study recommendations
+
+Write each area as a numbered heading followed by suggestions on lines starting with "-".
+Respond with a JSON object of the form {{"feedback_by_game_id": {{"<game_id>": "<feedback text>"}}}}.
 """
         return prompt
 
@@ -234,4 +352,46 @@ Focus on the most critical aspects and provide concrete suggestions for improvem
                 "exercises": ["Solve puzzles", "Play practice games"]
             }
         }
-        return feedback 
\ No newline at end of file
+        return feedback 
+
+@lru_cache(maxsize=None)
+def get_feedback_generator() -> AIFeedbackGenerator:
+    """Return the process-wide feedback generator, creating it (and its OpenAI client) on first use."""
+    return AIFeedbackGenerator()
+
+def generate_dynamic_feedback(results: Dict[int, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Summarise the analysed moves of several games and ask OpenAI for refined suggestions."""
+    # Flatten once, then aggregate with comprehensions and built-ins instead of per-move appends
+    moves = [move for game_analysis in results.values() for move in game_analysis]
+    total_time = sum(move.get("time_spent", 0) for move in moves)
+
+    feedback = {
+        "timeManagement": {"avgTimePerMove": total_time / len(moves) if moves else 0, "suggestion": ""},
+        "opening": {"playedMoves": [move["move"] for move in moves if move["move_number"] <= 5], "suggestion": ""},
+        "endgame": {"evaluation": "", "suggestion": ""},
+        "tacticalOpportunities": [
+            f"Tactical opportunity on move {move['move_number']}" for move in moves if move["is_capture"]
+        ]
+    }
+
+    client = get_feedback_generator().client
+    if client is None:
+        return feedback
+
+    # Generate refined suggestions via OpenAI
+    try:
+        dynamic_feedback = cached_completion(
+            client,
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": "You are a chess analysis expert providing specific, actionable feedback to help players improve their game."},
+                {"role": "user", "content": f"Provide actionable feedback for chess analysis: {orjson.dumps(feedback).decode()}"}
+            ],
+            max_tokens=200,
+            temperature=0.7
+        ).strip()
+        feedback["dynamicFeedback"] = dynamic_feedback
+    except Exception as e:
+        logger.error("Error generating feedback with OpenAI: %s", e)
+
+    return feedback
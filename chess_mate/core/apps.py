@@ -1,6 +1,16 @@
+import atexit
+
 from django.apps import AppConfig
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import checks  # noqa: F401  (registers system checks)
+        from . import tokens  # noqa: F401  (connects the blacklist cache receiver)
+
+        # Set up the shared Stockfish engine pool once per process
+        from .engine_pool import ENGINE_POOL
+        atexit.register(ENGINE_POOL.close)
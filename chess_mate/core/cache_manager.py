@@ -17,7 +17,7 @@ class CacheManager:
             try:
                 self.redis = redis.from_url(settings.REDIS_URL)
             except Exception as e:
-                logger.error(f"Failed to connect to Redis: {str(e)}")
+                logger.error("Failed to connect to Redis: %s", e)
                 self.use_redis = False
         self.default_ttl = 3600  # 1 hour default TTL
 
@@ -49,7 +49,7 @@ class CacheManager:
                 cache.set(key, compressed_data, timeout=ttl)
                 return True
         except Exception as e:
-            logger.error(f"Error caching analysis: {str(e)}")
+            logger.error("Error caching analysis: %s", e)
             return False
 
     def get_cached_analysis(self, game_id: int) -> Optional[Dict[str, Any]]:
@@ -66,7 +66,7 @@ class CacheManager:
                 return self._decompress_data(data)
             return None
         except Exception as e:
-            logger.error(f"Error retrieving cached analysis: {str(e)}")
+            logger.error("Error retrieving cached analysis: %s", e)
             return None
 
     def cache_position_evaluation(self, fen: str, evaluation: Dict[str, Any], ttl: Optional[int] = None) -> bool:
@@ -81,7 +81,7 @@ class CacheManager:
                 cache.set(key, compressed_data, timeout=ttl or self.default_ttl)
                 return True
         except Exception as e:
-            logger.error(f"Error caching position evaluation: {str(e)}")
+            logger.error("Error caching position evaluation: %s", e)
             return False
 
     def get_cached_position_evaluation(self, fen: str) -> Optional[Dict[str, Any]]:
@@ -98,7 +98,7 @@ class CacheManager:
                 return self._decompress_data(data)
             return None
         except Exception as e:
-            logger.error(f"Error retrieving cached position: {str(e)}")
+            logger.error("Error retrieving cached position: %s", e)
             return None
 
     def cache_user_games(self, user_id: int, games: List[Dict[str, Any]], ttl: Optional[int] = 1800) -> bool:
@@ -113,7 +113,7 @@ class CacheManager:
                 cache.set(key, compressed_data, timeout=ttl)
                 return True
         except Exception as e:
-            logger.error(f"Error caching user games: {str(e)}")
+            logger.error("Error caching user games: %s", e)
             return False
 
     def get_cached_user_games(self, user_id: int) -> Optional[List[Dict[str, Any]]]:
@@ -130,7 +130,7 @@ class CacheManager:
                 return self._decompress_data(data)
             return None
         except Exception as e:
-            logger.error(f"Error retrieving cached user games: {str(e)}")
+            logger.error("Error retrieving cached user games: %s", e)
             return None
 
     def invalidate_analysis_cache(self, game_id: int) -> bool:
@@ -143,7 +143,7 @@ class CacheManager:
                 cache.delete(key)
                 return True
         except Exception as e:
-            logger.error(f"Error invalidating analysis cache: {str(e)}")
+            logger.error("Error invalidating analysis cache: %s", e)
             return False
 
     def invalidate_user_games_cache(self, user_id: int) -> bool:
@@ -156,7 +156,7 @@ class CacheManager:
                 cache.delete(key)
                 return True
         except Exception as e:
-            logger.error(f"Error invalidating games cache: {str(e)}")
+            logger.error("Error invalidating games cache: %s", e)
             return False
 
     def clear_all_caches(self) -> bool:
@@ -168,7 +168,7 @@ class CacheManager:
                 cache.clear()
             return True
         except Exception as e:
-            logger.error(f"Error clearing caches: {str(e)}")
+            logger.error("Error clearing caches: %s", e)
             return False
 
     def get_cache_stats(self) -> Dict[str, int]:
@@ -193,7 +193,7 @@ class CacheManager:
                 "total_keys": analysis_keys + position_keys + games_keys
             }
         except Exception as e:
-            logger.error(f"Error getting cache stats: {str(e)}")
+            logger.error("Error getting cache stats: %s", e)
             return {
                 "analysis_count": 0,
                 "position_count": 0,
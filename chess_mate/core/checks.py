@@ -0,0 +1,33 @@
+"""
+System checks for ChessMate application.
+"""
+
+import hashlib
+
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.security)
+def check_openssl_hashlib(app_configs, **kwargs):
+    """
+    Warn when hashlib's SHA-256 is not backed by OpenSSL.
+
+    Stripe webhook signatures and JWTs are verified with HMAC-SHA256 on every request; the
+    builtin fallback is markedly slower than OpenSSL's hardware-accelerated implementation.
+    """
+    try:
+        import _hashlib
+    except ImportError:
+        openssl_backed = False
+    else:
+        openssl_backed = hashlib.sha256 is getattr(_hashlib, "openssl_sha256", None)
+
+    if openssl_backed:
+        return []
+    return [
+        Warning(
+            "hashlib.sha256 is not backed by OpenSSL.",
+            hint="Build Python against OpenSSL so HMAC-SHA256 verification uses the accelerated implementation.",
+            id="core.W001",
+        )
+    ]
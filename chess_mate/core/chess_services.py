@@ -4,12 +4,16 @@ and Lichess. It includes classes and methods to fetch game data, filter games by
 save game details to the database.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from django.utils.timezone import make_aware, get_current_timezone
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
 import requests
-import ndjson  # type: ignore
-import httpx
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
 import logging
 import re
 
@@ -17,6 +21,34 @@ from .models import Game
 
 logger = logging.getLogger(__name__)
 
+# How long an upstream game listing is reused for identical fetch requests
+GAMES_CACHE_TIMEOUT = 300
+REQUEST_TIMEOUT = 10
+# Monthly Chess.com archives downloaded side by side
+ARCHIVE_FETCH_WORKERS = 4
+
+def _build_session() -> requests.Session:
+    """
+    Build a shared HTTP session so Chess.com/Lichess calls reuse pooled keep-alive
+    connections instead of paying a TCP+TLS handshake per request.
+    """
+    session = requests.Session()
+    # Lichess rate-limits with 429 + Retry-After, so those waits are honoured before retrying
+    retries = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+        respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": "ChessMate/1.0 (your_email@example.com)"})
+    return session
+
+SESSION = _build_session()
+
 class ChessComService:
     """
     Service class to interact with Chess.com API.
@@ -28,11 +60,8 @@ class ChessComService:
         """
         Fetch the list of archives for a given username.
         """
-        headers = {
-            "User-Agent": "ChessMate/1.0 (your_email@example.com)"
-        }
         url = f"{ChessComService.BASE_URL}/{username}/games/archives"
-        response = requests.get(url, headers=headers, timeout=10)
+        response = SESSION.get(url, timeout=REQUEST_TIMEOUT)
         if response.status_code == 200:
             archives = response.json().get("archives", [])
             print(f"Archives fetched: {archives}")
@@ -57,7 +86,7 @@ class ChessComService:
                 year, month, day = map(int, date_str.split('.'))
                 date = datetime(year, month, day)
             except (ValueError, TypeError):
-                logger.warning(f"Invalid date format: {date_str}")
+                logger.warning("Invalid date format: %s", date_str)
                 date = None
         
         # Extract time from [UTCTime "HH:mm:ss"]
@@ -67,7 +96,7 @@ class ChessComService:
             try:
                 time = datetime.strptime(time_str, '%H:%M:%S').time()
             except ValueError:
-                logger.warning(f"Invalid time format: {time_str}")
+                logger.warning("Invalid time format: %s", time_str)
                 time = None
         
         # First try to extract opening from ECOUrl
@@ -99,6 +128,30 @@ class ChessComService:
             'opening_name': opening
         }
 
+    @staticmethod
+    def _fetch_archive(archive_url: str) -> List[Dict[str, Any]]:
+        """Fetch the games of one monthly archive."""
+        response = SESSION.get(archive_url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.json().get("games", [])
+
+    @staticmethod
+    def _iter_archive_games(archive_urls: List[str]) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Yield ``(archive_url, games)`` in the given order, downloading up to ARCHIVE_FETCH_WORKERS
+        months at a time. Windows are fetched lazily, so a consumer that stops early never
+        requests the older months. Archives that fail to download are logged and skipped.
+        """
+        with ThreadPoolExecutor(max_workers=ARCHIVE_FETCH_WORKERS) as executor:
+            for start in range(0, len(archive_urls), ARCHIVE_FETCH_WORKERS):
+                window = archive_urls[start:start + ARCHIVE_FETCH_WORKERS]
+                futures = [executor.submit(ChessComService._fetch_archive, url) for url in window]
+                for archive_url, future in zip(window, futures):
+                    try:
+                        yield archive_url, future.result()
+                    except (requests.RequestException, ValueError) as e:
+                        logger.error("Error fetching archive %s: %s", archive_url, e)
+
     @staticmethod
     def fetch_games(username: str, game_type: str = "all", limit: int = 10) -> List[Dict[str, Any]]:
         """
@@ -107,75 +160,70 @@ class ChessComService:
         try:
             # First get the archives
             archives_url = f"https://api.chess.com/pub/player/{username}/games/archives"
-            with httpx.Client() as client:
-                archives_response = client.get(archives_url)
-                archives_response.raise_for_status()
-                archives = archives_response.json().get("archives", [])
+            archives_response = SESSION.get(archives_url, timeout=REQUEST_TIMEOUT)
+            archives_response.raise_for_status()
+            archives = archives_response.json().get("archives", [])
                 
-                logger.info(f"Archives fetched: {archives}")
+            logger.info("Archives fetched: %s", archives)
                 
-                if not archives:
-                    logger.warning(f"No archives found for user {username}")
-                    return []
+            if not archives:
+                logger.warning("No archives found for user %s", username)
+                return []
 
-                # Process archives in reverse order (newest first)
-                formatted_games = []
-                for archive_url in reversed(archives):
-                    try:
-                        games_response = client.get(archive_url)
-                        games_response.raise_for_status()
-                        games_data = games_response.json().get("games", [])
-                        
-                        logger.info(f"Processing archive {archive_url}, found {len(games_data)} games")
+            # Process archives in reverse order (newest first)
+            formatted_games = []
+            for archive_url, games_data in ChessComService._iter_archive_games(list(reversed(archives))):
+                try:
+                    logger.info("Processing archive %s, found %s games", archive_url, len(games_data))
                         
-                        # Filter and format games
-                        for game in games_data:
-                            # Skip if not the requested game type
-                            if game_type != "all" and game.get("time_class") != game_type:
-                                continue
+                    # Filter and format games
+                    for game in games_data:
+                        # Skip if not the requested game type
+                        if game_type != "all" and game.get("time_class") != game_type:
+                            continue
                             
-                            # Extract PGN info
-                            pgn_info = ChessComService._extract_pgn_info(game.get("pgn", ""))
+                        # Extract PGN info
+                        pgn_info = ChessComService._extract_pgn_info(game.get("pgn", ""))
                             
-                            # Determine opponent
-                            white_username = game.get("white", {}).get("username", "Unknown")
-                            black_username = game.get("black", {}).get("username", "Unknown")
-                            opponent = black_username if username.lower() == white_username.lower() else white_username
+                        # Determine opponent
+                        white_username = game.get("white", {}).get("username", "Unknown")
+                        black_username = game.get("black", {}).get("username", "Unknown")
+                        opponent = black_username if username.lower() == white_username.lower() else white_username
                             
-                            # Format the game data
-                            formatted_game = {
-                                "game_id": game.get("url", "").split("/")[-1],
-                                "platform": "chess.com",
-                                "white": white_username,
-                                "black": black_username,
-                                "opponent": opponent,
-                                "result": ChessComService._format_result(
-                                    game.get("white" if username.lower() == white_username.lower() else "black", {}).get("result", ""),
-                                    username
-                                ),
-                                "pgn": game.get("pgn", ""),
-                                "date_played": pgn_info['played_at'],
-                                "opening_name": pgn_info['opening_name']
-                            }
+                        # Format the game data
+                        formatted_game = {
+                            "game_id": game.get("url", "").split("/")[-1],
+                            "platform": "chess.com",
+                            "white": white_username,
+                            "black": black_username,
+                            "opponent": opponent,
+                            "result": ChessComService._format_result(
+                                game.get("white" if username.lower() == white_username.lower() else "black", {}).get("result", ""),
+                                username
+                            ),
+                            "pgn": game.get("pgn", ""),
+                            "date_played": pgn_info['played_at'],
+                            "opening_name": pgn_info['opening_name']
+                        }
                             
-                            logger.info(f"Formatted game: {formatted_game}")
-                            formatted_games.append(formatted_game)
+                        logger.info("Formatted game: %s", formatted_game)
+                        formatted_games.append(formatted_game)
                             
-                            if len(formatted_games) >= limit:
-                                logger.info(f"Reached limit of {limit} games")
-                                return formatted_games
-                    except Exception as e:
-                        logger.error(f"Error processing archive {archive_url}: {str(e)}")
-                        continue
+                        if len(formatted_games) >= limit:
+                            logger.info("Reached limit of %s games", limit)
+                            return formatted_games
+                except Exception as e:
+                    logger.error("Error processing archive %s: %s", archive_url, e)
+                    continue
                 
-                logger.info(f"Total games fetched: {len(formatted_games)} {game_type} games")
-                return formatted_games
+            logger.info("Total games fetched: %s %s games", len(formatted_games), game_type)
+            return formatted_games
 
-        except httpx.HTTPError as e:
-            logger.error(f"HTTP error fetching games from Chess.com: {str(e)}")
+        except requests.RequestException as e:
+            logger.error("HTTP error fetching games from Chess.com: %s", e)
             raise
         except Exception as e:
-            logger.error(f"Error fetching games from Chess.com: {str(e)}")
+            logger.error("Error fetching games from Chess.com: %s", e)
             raise
 
     @staticmethod
@@ -212,43 +260,55 @@ class LichessService:
                 "moves": True
             }
             
-            with httpx.Client() as client:
-                response = client.get(url, params={k: v for k, v in params.items() if v is not None})
+            # Lichess streams one game per NDJSON line; parse lines as they arrive and stop
+            # reading (dropping the connection) once enough games are collected
+            with SESSION.get(
+                url,
+                params={k: v for k, v in params.items() if v is not None},
+                headers={"Accept": "application/x-ndjson"},
+                timeout=REQUEST_TIMEOUT,
+                stream=True
+            ) as response:
                 response.raise_for_status()
-                
-                games = response.json()
-                formatted_games = []
-                
-                for game in games:
-                    white_username = game.get("players", {}).get("white", {}).get("user", {}).get("name", "Unknown")
-                    black_username = game.get("players", {}).get("black", {}).get("user", {}).get("name", "Unknown")
-                    opponent = black_username if username.lower() == white_username.lower() else white_username
-                    
-                    formatted_game = {
-                        "game_id": game.get("id"),
-                        "platform": "lichess",
-                        "white": white_username,
-                        "black": black_username,
-                        "opponent": opponent,
-                        "result": LichessService._format_result(game.get("winner"), username),
-                        "pgn": game.get("moves", ""),
-                        "played_at": make_aware(datetime.fromtimestamp(game.get("createdAt", 0) / 1000), timezone=get_current_timezone()),
-                        "opening_name": game.get("opening", {}).get("name") or game.get("opening", {}).get("eco", {}).get("name", "Unknown Opening")
-                    }
-                    formatted_games.append(formatted_game)
-                    
-                    if len(formatted_games) >= limit:
-                        break
-                
-                return formatted_games
+                return LichessService._format_games(response.iter_lines(), username, limit)
 
-        except httpx.HTTPError as e:
-            logger.error(f"HTTP error fetching games from Lichess: {str(e)}")
+        except requests.RequestException as e:
+            logger.error("HTTP error fetching games from Lichess: %s", e)
             raise
         except Exception as e:
-            logger.error(f"Error fetching games from Lichess: {str(e)}")
+            logger.error("Error fetching games from Lichess: %s", e)
             raise
 
+    @staticmethod
+    def _format_games(lines: Iterable[bytes], username: str, limit: int) -> List[Dict[str, Any]]:
+        """Format games from Lichess NDJSON lines, reading no further than ``limit`` games."""
+        formatted_games = []
+        for line in lines:
+            if not line:
+                continue
+            game = orjson.loads(line)
+            white_username = game.get("players", {}).get("white", {}).get("user", {}).get("name", "Unknown")
+            black_username = game.get("players", {}).get("black", {}).get("user", {}).get("name", "Unknown")
+            opponent = black_username if username.lower() == white_username.lower() else white_username
+
+            formatted_game = {
+                "game_id": game.get("id"),
+                "platform": "lichess",
+                "white": white_username,
+                "black": black_username,
+                "opponent": opponent,
+                "result": LichessService._format_result(game.get("winner"), username),
+                "pgn": game.get("moves", ""),
+                "played_at": make_aware(datetime.fromtimestamp(game.get("createdAt", 0) / 1000), timezone=get_current_timezone()),
+                "opening_name": game.get("opening", {}).get("name") or game.get("opening", {}).get("eco", {}).get("name", "Unknown Opening")
+            }
+            formatted_games.append(formatted_game)
+
+            if len(formatted_games) >= limit:
+                break
+
+        return formatted_games
+
     @staticmethod
     def _format_result(winner: Optional[str], username: str) -> str:
         """Format the game result."""
@@ -259,61 +319,59 @@ class LichessService:
         else:
             return "loss"
 
-def save_game(game: Dict[str, Any], username: str, user) -> Optional[Game]:
+def _games_cache_key(platform: str, username: str, game_type: str, limit: int) -> str:
+    return f"games:{platform}:{username.lower()}:{game_type}:{limit}"
+
+def fetch_games_cached(platform: str, username: str, game_type: str = "all", limit: int = 10) -> List[Dict[str, Any]]:
     """
-    Save a game to the database.
+    Fetch games from Chess.com or Lichess, reusing the upstream response for identical
+    requests made within GAMES_CACHE_TIMEOUT seconds.
     """
-    try:
-        end_time = game.get("end_time")
-        played_at = None
-
-        if isinstance(end_time, (int, str)):
-            naive_datetime = (
-                datetime.fromtimestamp(end_time)
-                if isinstance(end_time, int)
-                else datetime.fromisoformat(end_time)
-            )
-            played_at = make_aware(naive_datetime, timezone=get_current_timezone())
+    service = ChessComService if platform == "chess.com" else LichessService
+    return cache.get_or_set(
+        _games_cache_key(platform, username, game_type, limit),
+        lambda: service.fetch_games(username, game_type, limit=limit),
+        timeout=GAMES_CACHE_TIMEOUT
+    )
 
-        game_url = game.get("url")
-        if not game_url or Game.objects.filter(game_url=game_url).exists():
-            return None
+def invalidate_games_cache(platform: str, username: str, game_type: str = "all", limit: int = 10) -> None:
+    """Drop a cached upstream game listing so the next fetch hits the platform again."""
+    cache.delete(_games_cache_key(platform, username, game_type, limit))
 
-        white_player = game.get("white", {}).get("username", "").lower()
-        black_player = game.get("black", {}).get("username", "").lower()
-
-        is_white = username.lower() == white_player
-        if not is_white and username.lower() != black_player:
-            return None
-
-        result = (
-            game.get("white" if is_white else "black", {})
-            .get("result", "unknown")
-        )
+def save_games(user, platform: str, games: List[Dict[str, Any]], limit: Optional[int] = None) -> List[Game]:
+    """
+    Save fetched games for a user in bulk, skipping games that were already imported.
 
-        final_result = (
-            "Win" if result == "win"
-            else "Loss" if result in ["checkmated", "timeout"]
-            else "Draw"
+    Existing games are looked up with a single query and the new ones are written with
+    one multi-row INSERT. Imports are not serialised per user, so if an overlapping import
+    commits some of the same games first, the INSERT is rolled back to its savepoint and
+    the lookup is repeated against what that import saved. Returns the newly created games.
+    """
+    game_ids = [game_data.get("game_id") for game_data in games if game_data.get("game_id")]
+    while True:
+        seen = set(
+            Game.objects.filter(user=user, platform=platform, game_id__in=game_ids)
+            .values_list("game_id", flat=True)
         )
 
-        opponent = black_player if is_white else white_player
-
-        if Game.objects.filter(game_url=game_url).exists():
-            print(f"Game with URL {game_url} already exists. Skipping.")
-            return None
+        new_games = []
+        for game_data in games:
+            game_id = game_data.get("game_id")
+            if not game_id:
+                logger.warning("Skipping game without game_id: %s", game_data)
+                continue
+            if game_id in seen:
+                continue
+            seen.add(game_id)
 
-        return Game.objects.create(
-            player=user,
-            opponent=opponent or "Unknown",
-            result=final_result,
-            played_at=played_at,
-            opening_name=game.get("opening", {}).get("name"),
-            pgn=game.get("pgn"),
-            game_url=game_url,
-            is_white=is_white,
-        )
+            new_games.append(Game.from_platform_dict(user, platform, game_data))
+            if limit and len(new_games) >= limit:
+                break
 
-    except (ValueError, TypeError, KeyError, requests.RequestException) as e:
-        print(f"Error saving game: {str(e)}")
-        return None
+        try:
+            with transaction.atomic():
+                Game.objects.bulk_create(new_games, batch_size=500)
+        except IntegrityError:
+            logger.info("Games for user %s were imported concurrently, deduplicating again", user.pk)
+            continue
+        return new_games
@@ -0,0 +1,37 @@
+"""
+Cached credit balances for ChessMate application.
+
+The database stays the source of truth; the cache holds each user's balance so repeated
+reads are served without a query, and every write path drops the cached value.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Profile
+
+# Bounds how long a balance can drift from the database if a cache update is ever missed
+CREDITS_CACHE_TIMEOUT = 300
+
+
+def get_cached_credits(user_id: int) -> int:
+    """Return a user's credit balance, reading through to the database on a cache miss."""
+    key = Profile.credits_cache_key(user_id)
+    credits = cache.get(key)
+    if credits is None:
+        credits = Profile.objects.values_list('credits', flat=True).get(user_id=user_id)
+        cache.set(key, credits, timeout=CREDITS_CACHE_TIMEOUT)
+    return credits
+
+
+def expire_cached_credits(user_id: int) -> None:
+    """
+    Drop the cached balance after a credit change made with a queryset ``update()``.
+
+    ``update()`` bypasses the Profile post_save receiver, so every such path must call this.
+    The key is dropped now and again once the surrounding transaction commits, so a read
+    inside the transaction cannot leave an uncommitted balance behind in the cache.
+    """
+    key = Profile.credits_cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
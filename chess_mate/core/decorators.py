@@ -10,7 +10,7 @@ logger = logging.getLogger(__name__)
 try:
     rate_limiter = RateLimiter()
 except ImproperlyConfigured as e:
-    logger.error(f"Failed to initialize rate limiter: {str(e)}")
+    logger.error("Failed to initialize rate limiter: %s", e)
     rate_limiter = None
 
 def rate_limit(endpoint_type: str = 'DEFAULT') -> Callable:
@@ -40,14 +40,14 @@ def rate_limit(endpoint_type: str = 'DEFAULT') -> Callable:
             try:
                 if rate_limiter.is_rate_limited(rate_limit_key, endpoint_type):
                     remaining_time = rate_limiter.get_reset_time(rate_limit_key)
-                    logger.warning(f"Rate limit exceeded for user {request.user.id} on endpoint {request.path}")
+                    logger.warning("Rate limit exceeded for user %s on endpoint %s", request.user.id, request.path)
                     return JsonResponse({
                         'error': 'Rate limit exceeded',
                         'message': f'Please try again in {remaining_time} seconds',
                         'reset_time': remaining_time
                     }, status=429)
             except Exception as e:
-                logger.error(f"Error checking rate limit: {str(e)}")
+                logger.error("Error checking rate limit: %s", e)
                 # Continue with the request on rate limit errors
                 return view_func(request, *args, **kwargs)
             
@@ -66,7 +66,7 @@ def rate_limit(endpoint_type: str = 'DEFAULT') -> Callable:
                 
                 return response
             except Exception as e:
-                logger.error(f"Error in rate limited view: {str(e)}")
+                logger.error("Error in rate limited view: %s", e)
                 return view_func(request, *args, **kwargs)
                 
         return _wrapped_view
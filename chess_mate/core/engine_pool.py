@@ -0,0 +1,123 @@
+"""
+This module provides a process-wide pool of persistent Stockfish engines. Reusing warm engines
+avoids paying the engine startup cost (process spawn, UCI handshake, NNUE load) on every
+analysis request.
+"""
+
+import os
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import chess.engine
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EnginePool:
+    """
+    Fixed-size pool of Stockfish engines shared by the analysis views and tasks.
+
+    Engines are spawned lazily, up to ``size`` instances, and handed out through a queue.
+    Engines that die while checked out are dropped on release so their slot can be refilled
+    by the next ``acquire``.
+    """
+
+    def __init__(
+        self,
+        stockfish_path: Optional[str] = None,
+        size: Optional[int] = None,
+        threads_per_engine: Optional[int] = None,
+        hash_mb: Optional[int] = None
+    ):
+        self.stockfish_path = stockfish_path or getattr(settings, "STOCKFISH_PATH", "stockfish")
+        self.threads_per_engine = max(1, threads_per_engine or getattr(settings, "STOCKFISH_THREADS_PER_ENGINE", 1))
+        self.hash_mb = hash_mb or getattr(settings, "STOCKFISH_HASH_MB", 256)
+        self.size = size or getattr(settings, "ENGINE_POOL_SIZE", None) or max(
+            1, (os.cpu_count() or 1) // self.threads_per_engine
+        )
+        self._idle: "queue.Queue[chess.engine.SimpleEngine]" = queue.Queue()
+        self._spawned = 0
+        self._lock = threading.Lock()
+
+    def _spawn(self) -> chess.engine.SimpleEngine:
+        """Start a new engine process and apply the pool's UCI options."""
+        engine = chess.engine.SimpleEngine.popen_uci(self.stockfish_path)
+        try:
+            engine.configure({"Threads": self.threads_per_engine, "Hash": self.hash_mb})
+        except chess.engine.EngineError as e:
+            logger.warning("Could not configure engine options: %s", str(e))
+        logger.info("Spawned Stockfish engine (%d/%d)", self._spawned, self.size)
+        return engine
+
+    def acquire(self, timeout: Optional[float] = None) -> chess.engine.SimpleEngine:
+        """
+        Check an engine out of the pool, spawning one if the pool is not yet full.
+
+        Blocks until an engine is released when all slots are in use.
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._spawned < self.size:
+                self._spawned += 1
+                try:
+                    return self._spawn()
+                except Exception:
+                    self._spawned -= 1
+                    raise
+
+        return self._idle.get(timeout=timeout)
+
+    @contextmanager
+    def engine(self, timeout: Optional[float] = None) -> Iterator[chess.engine.SimpleEngine]:
+        """
+        Borrow an engine for the duration of a ``with`` block.
+
+        The engine goes back to the pool when the block exits normally. If the block raises, the
+        engine may be stuck mid-search, so it is discarded and a fresh one spawned on demand.
+        """
+        engine = self.acquire(timeout=timeout)
+        try:
+            yield engine
+        except BaseException:
+            self.discard(engine)
+            raise
+        self.release(engine)
+
+    def release(self, engine: chess.engine.SimpleEngine) -> None:
+        """Return an engine to the pool, discarding it if the process has terminated."""
+        try:
+            engine.ping()
+        except (chess.engine.EngineTerminatedError, chess.engine.EngineError) as e:
+            logger.warning("Discarding dead Stockfish engine: %s", str(e))
+            self.discard(engine)
+            return
+        self._idle.put(engine)
+
+    def discard(self, engine: chess.engine.SimpleEngine) -> None:
+        """Drop an engine from the pool and free its slot."""
+        try:
+            engine.quit()
+        except Exception:
+            pass
+        with self._lock:
+            self._spawned = max(0, self._spawned - 1)
+
+    def close(self) -> None:
+        """Shut down all idle engines."""
+        while True:
+            try:
+                engine = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(engine)
+
+
+ENGINE_POOL = EnginePool()
@@ -6,37 +6,72 @@ database, and generate feedback based on the analysis.
 
 import os
 import io
+import hashlib
+import queue
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 import chess
 import chess.engine
 import chess.pgn
+from django.core.cache import cache
 from django.db import DatabaseError
 from .models import Game
-from datetime import datetime
-from typing import List, Dict, Any
+from .engine_pool import ENGINE_POOL
+from typing import Callable, List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
 
 STOCKFISH_PATH = os.getenv("STOCKFISH_PATH")
 
+# Positions recur across games and users, so engine evaluations are kept for a week
+POSITION_EVAL_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+# The parts of a move analysis that depend only on the position and depth
+POSITION_EVAL_FIELDS = ("score", "depth", "time_spent", "is_mate")
+
+def position_eval_cache_key(board: chess.Board, depth: int) -> str:
+    """Cache key for the engine evaluation of a position at a given depth."""
+    digest = hashlib.blake2b(board.fen().encode(), digest_size=16).hexdigest()
+    return f"chess:eval:{digest}:{depth}"
+
 class GameAnalyzer:
     """
     Handles game analysis using Stockfish or external APIs.
     """
 
-    def __init__(self, stockfish_path=STOCKFISH_PATH):
+    def __init__(self, stockfish_path=STOCKFISH_PATH, engine=None):
+        # Engines handed in by the caller come from ENGINE_POOL and are returned to it on close
+        self._pooled = engine is not None
+        if engine is not None:
+            self.engine = engine
+            return
+
         try:
             self.engine = chess.engine.SimpleEngine.popen_uci(stockfish_path)
         except (chess.engine.EngineError, ValueError) as e:
             logger.error("Failed to initialize Stockfish engine: %s", str(e))
             raise
 
-    def analyze_move(self, board, move, depth=20):
-        """Analyze a single move and return the evaluation."""
+    def analyze_move(self, board, move, depth=20, game_key=None, cached_eval=None):
+        """
+        Analyze a single move and return the evaluation.
+
+        A change of ``game_key`` makes python-chess send ``ucinewgame`` first, so a pooled
+        engine does not carry search state over from a previously analyzed game. A
+        ``cached_eval`` (see ``POSITION_EVAL_FIELDS``) is used instead of running the engine.
+        """
+        if cached_eval is not None:
+            return {
+                "move": move.uci(),
+                **cached_eval,
+                "is_capture": board.is_capture(move),
+                "move_number": board.fullmove_number
+            }
+
         try:
-            start_time = datetime.utcnow()
-            result = self.engine.analyse(board, chess.engine.Limit(depth=depth))
-            time_spent = (datetime.utcnow() - start_time).total_seconds()
+            start_time = time.perf_counter_ns()
+            result = self.engine.analyse(board, chess.engine.Limit(depth=depth), game=game_key)
+            time_spent = (time.perf_counter_ns() - start_time) / 1e9
             
             # Get the score, using PovScore for proper initialization
             score_obj = result.get("score", chess.engine.PovScore(chess.engine.Cp(0), chess.WHITE))
@@ -78,7 +113,7 @@ class GameAnalyzer:
             try:
                 results[game.id] = self.analyze_single_game(game, depth)
             except Exception as e:
-                logger.error(f"Error analyzing game {game.id}: {str(e)}")
+                logger.error("Error analyzing game %s: %s", game.id, e)
                 continue
         return results
 
@@ -120,9 +155,21 @@ class GameAnalyzer:
         except Exception as e:
             raise ValueError(f"Invalid PGN data: {str(e)}")
         
-        # Analyze each move
+        # Look up every position of the game in one round-trip; only misses reach the engine
+        keys = []
+        replay = board.copy()
         for move in moves:
-            move_analysis = self.analyze_move(board, move, depth)
+            keys.append(position_eval_cache_key(replay, depth))
+            replay.push(move)
+        cached_evals = cache.get_many(keys)
+        new_evals = {}
+
+        # Analyze each move
+        for key, move in zip(keys, moves):
+            move_analysis = self.analyze_move(board, move, depth, game_key=game.id,
+                                              cached_eval=cached_evals.get(key))
+            if move_analysis and key not in cached_evals:
+                new_evals[key] = {field: move_analysis[field] for field in POSITION_EVAL_FIELDS}
             if move_analysis:
                 # Calculate evaluation drop and mark critical moves
                 current_score = move_analysis["score"]
@@ -139,7 +186,9 @@ class GameAnalyzer:
                 last_score = current_score
             
             board.push(move)
-        
+
+        if new_evals:
+            cache.set_many(new_evals, timeout=POSITION_EVAL_CACHE_TIMEOUT)
         return analysis
 
     def save_analysis_to_db(self, game, analysis_results):
@@ -156,9 +205,12 @@ class GameAnalyzer:
         except (DatabaseError, ValueError) as e:
             logger.error("Error saving analysis to database: %s", str(e))
 
-    def generate_feedback(self, game_analysis):
+    @classmethod
+    def generate_feedback(cls, game_analysis):
         """
         Generate comprehensive feedback based on the game analysis.
+
+        Works on stored analysis alone, so it can be called on the class without an engine.
         """
         feedback = {
             "mistakes": 0,
@@ -264,22 +316,23 @@ class GameAnalyzer:
             feedback["positional_play"]["king_safety"] = max(0, 100 + (feedback["positional_play"]["king_safety"] * 10))
 
         # Generate suggestions based on analysis
-        feedback["time_management"]["suggestion"] = self._generate_time_management_suggestion(
+        feedback["time_management"]["suggestion"] = cls._generate_time_management_suggestion(
             feedback["time_management"]
         )
-        feedback["opening"]["suggestion"] = self._generate_opening_suggestion(
+        feedback["opening"]["suggestion"] = cls._generate_opening_suggestion(
             feedback["opening"]
         )
-        feedback["endgame"]["suggestion"] = self._generate_endgame_suggestion(
+        feedback["endgame"]["suggestion"] = cls._generate_endgame_suggestion(
             feedback["endgame"]
         )
-        feedback["positional_play"]["suggestion"] = self._generate_positional_suggestion(
+        feedback["positional_play"]["suggestion"] = cls._generate_positional_suggestion(
             feedback["positional_play"]
         )
 
         return feedback
 
-    def _generate_time_management_suggestion(self, time_data):
+    @staticmethod
+    def _generate_time_management_suggestion(time_data):
         avg_time = time_data["avg_time_per_move"]
         critical_moments = len(time_data["critical_moments"])
         time_pressure = len(time_data["time_pressure_moves"])
@@ -293,7 +346,8 @@ class GameAnalyzer:
         else:
             return "Your time management is generally good. Keep balancing quick play with careful consideration in critical positions."
 
-    def _generate_opening_suggestion(self, opening_data):
+    @staticmethod
+    def _generate_opening_suggestion(opening_data):
         accuracy = opening_data["accuracy"]
         if accuracy < 50:
             return "Your opening play needs improvement. Study common opening principles and popular lines in your repertoire."
@@ -302,7 +356,8 @@ class GameAnalyzer:
         else:
             return "Your opening play is strong. Consider expanding your repertoire with more complex variations."
 
-    def _generate_endgame_suggestion(self, endgame_data):
+    @staticmethod
+    def _generate_endgame_suggestion(endgame_data):
         accuracy = endgame_data["accuracy"]
         if accuracy < 50:
             return "Your endgame technique needs work. Practice basic endgame positions and principles."
@@ -311,7 +366,8 @@ class GameAnalyzer:
         else:
             return "Your endgame technique is strong. Focus on maximizing your advantages in winning positions."
 
-    def _generate_positional_suggestion(self, positional_data):
+    @staticmethod
+    def _generate_positional_suggestion(positional_data):
         """Generate suggestion based on positional play data."""
         piece_activity = positional_data["piece_activity"]
         king_safety = positional_data["king_safety"]
@@ -324,9 +380,65 @@ class GameAnalyzer:
             return "Your positional understanding is good. Continue focusing on piece coordination and maintaining a solid pawn structure."
 
     def close_engine(self):
-        """Closes the Stockfish engine."""
-        if self.engine:
+        """Closes the Stockfish engine, or hands it back to the pool if it is pooled."""
+        if not self.engine:
+            return
+        if self._pooled:
+            ENGINE_POOL.release(self.engine)
+        else:
             self.engine.quit()
+        self.engine = None
+
+def analyze_games_in_parallel(games: List[Game], depth: int = 20,
+                              acquire_timeout: Optional[float] = None,
+                              on_progress: Optional[Callable[[int], None]] = None) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Analyze several games side by side, one pooled Stockfish engine per worker thread.
+
+    The search runs in the engine subprocesses, so the threads only wait on engine I/O. One engine
+    is waited for (up to ``acquire_timeout`` seconds, raising ``queue.Empty`` if none frees up);
+    more are taken only while the pool has them free, so a busy pool degrades to serial analysis.
+    Games that fail to analyze are logged and left out of the result, as in ``analyze_games``.
+    ``on_progress`` is called with the number of games finished so far, in game order.
+    """
+    if not games:
+        raise ValueError("No games provided for analysis")
+
+    idle: "queue.Queue[GameAnalyzer]" = queue.Queue()
+    idle.put(GameAnalyzer(engine=ENGINE_POOL.acquire(timeout=acquire_timeout)))
+    workers = 1
+    try:
+        while workers < min(len(games), ENGINE_POOL.size):
+            try:
+                idle.put(GameAnalyzer(engine=ENGINE_POOL.acquire(timeout=0)))
+            except queue.Empty:
+                break
+            except (chess.engine.EngineError, OSError) as e:
+                logger.warning("Could not start an extra engine for batch analysis: %s", str(e))
+                break
+            workers += 1
+
+        def analyze(game):
+            analyzer = idle.get()
+            try:
+                return game.id, analyzer.analyze_single_game(game, depth)
+            except Exception as e:
+                logger.error("Error analyzing game %s: %s", game.id, e)
+                return game.id, None
+            finally:
+                idle.put(analyzer)
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for done, (game_id, analysis) in enumerate(executor.map(analyze, games), start=1):
+                if analysis is not None:
+                    results[game_id] = analysis
+                if on_progress:
+                    on_progress(done)
+        return results
+    finally:
+        while not idle.empty():
+            idle.get_nowait().close_engine()
 
 # Placeholder for future enhancement to support asynchronous analysis using Celery
 # from celery import shared_task
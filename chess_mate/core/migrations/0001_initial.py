@@ -0,0 +1,141 @@
+# Generated by Django 5.1.15 on 2026-10-16 00:08
+
+import core.models
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Player',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=100, unique=True)),
+                ('date_joined', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CreditedPayment',
+            fields=[
+                ('session_id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('credits', models.IntegerField()),
+                ('claim_id', models.UUIDField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='credited_payments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'credited_payments',
+            },
+        ),
+        migrations.CreateModel(
+            name='Game',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(max_length=20)),
+                ('game_id', models.CharField(max_length=100)),
+                ('pgn', models.TextField()),
+                ('result', models.CharField(max_length=10)),
+                ('white', models.CharField(max_length=100)),
+                ('black', models.CharField(max_length=100)),
+                ('opponent', models.CharField(default='Unknown', max_length=100)),
+                ('opening_name', models.CharField(default='Unknown Opening', max_length=200)),
+                ('date_played', models.DateTimeField()),
+                ('analysis', models.JSONField(blank=True, null=True)),
+                ('feedback', models.JSONField(blank=True, null=True)),
+                ('analysis_hash', models.CharField(blank=True, default='', max_length=32)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(default=core.models.get_default_user, on_delete=django.db.models.deletion.CASCADE, related_name='games', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'games',
+                'ordering': ['-date_played'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_type', models.CharField(choices=[('analysis', 'Analysis'), ('batch_analysis', 'Batch Analysis'), ('feedback', 'Feedback'), ('fetch_games', 'Fetch Games')], max_length=20)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('result', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analysis_jobs', to=settings.AUTH_USER_MODEL)),
+                ('game', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.game')),
+            ],
+            options={
+                'db_table': 'analysis_jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='GameAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('analysis_data', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('game', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='core.game')),
+            ],
+            options={
+                'db_table': 'game_analysis',
+            },
+        ),
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating', models.IntegerField(default=1200)),
+                ('credits', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('email_verified', models.BooleanField(default=False)),
+                ('email_verified_at', models.DateTimeField(blank=True, null=True)),
+                ('email_verification_token', models.CharField(blank=True, max_length=100, null=True)),
+                ('email_verification_sent_at', models.DateTimeField(blank=True, null=True)),
+                ('preferences', models.JSONField(blank=True, default=dict)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Transaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_type', models.CharField(choices=[('purchase', 'Purchase'), ('usage', 'Usage'), ('refund', 'Refund')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('credits', models.IntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed'), ('refunded', 'Refunded')], max_length=20)),
+                ('stripe_payment_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'transactions',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['user', '-date_played'], name='game_user_date_played_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='game',
+            unique_together={('user', 'platform', 'game_id')},
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['user', 'rating'], name='core_profil_user_id_802922_idx'),
+        ),
+    ]
@@ -6,13 +6,19 @@ Models:
 - Profile: Represents a user profile with additional information.
 - Game: Represents a chess game played by a user.
 - GameAnalysis: Represents the analysis of a chess game, including move details and scores.
+- AnalysisJob: Tracks a background analysis or game import task.
+- CreditedPayment: Records checkout sessions that have already been credited.
 """
 
+import json
+import hashlib
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.core.cache import cache
 from django.utils import timezone
 from typing import Any
 
@@ -38,18 +44,23 @@ class Profile(models.Model):
     preferences = models.JSONField(default=dict, blank=True)
 
     def total_games(self):
-        return self.user.game_set.count()
+        return self.user.games.count()
 
     def win_rate(self):
         total = self.total_games()
         if total == 0:
             return "0%"
-        wins = self.user.game_set.filter(result="win").count()
+        wins = self.user.games.filter(result="win").count()
         return f"{(wins / total * 100):.1f}%"
 
     def __str__(self):
         return f"{self.user.username}'s profile"
 
+    @staticmethod
+    def credits_cache_key(user_id: int) -> str:
+        """Cache key holding a user's credit balance."""
+        return f"credits:{user_id}"
+
     class Meta:
         indexes = [
             models.Index(fields=['user', 'rating']),
@@ -71,6 +82,21 @@ class Profile(models.Model):
         self.preferences[key] = value
         self.save()
 
+@receiver(post_save, sender=Profile)
+def invalidate_cached_credits(sender: Any, instance: Profile, **kwargs: Any) -> None:
+    """Drop the cached credit balance whenever a profile is saved."""
+    cache.delete(Profile.credits_cache_key(instance.user_id))
+
+def login_email_cache_key(email: str) -> str:
+    """Cache key mapping a login email to its user id."""
+    return f"email2uid:{hashlib.blake2b(email.encode(), digest_size=16).hexdigest()}"
+
+@receiver(post_save, sender=User)
+def forget_login_email(sender: Any, instance: User, **kwargs: Any) -> None:
+    """Drop any cached lookup for the user's email, e.g. an unknown-email marker cached before signup."""
+    if instance.email:
+        cache.delete(login_email_cache_key(instance.email))
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender: Any, instance: User, created: bool, **kwargs: Any) -> None:
     """Create a Profile instance when a new User is created."""
@@ -103,16 +129,46 @@ class Game(models.Model):
     date_played = models.DateTimeField()
     analysis = models.JSONField(null=True, blank=True)
     feedback = models.JSONField(null=True, blank=True)  # Store analysis feedback
+    analysis_hash = models.CharField(max_length=32, blank=True, default='')  # Digest of the analysis the feedback was built from
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self) -> str:
         return f"{self.user.username} vs {self.opponent} ({self.result})"
 
+    @classmethod
+    def from_platform_dict(cls, user: User, platform: str, game_data: dict) -> "Game":
+        """Build an unsaved game from a game dict returned by the Chess.com or Lichess service."""
+        return cls(
+            user=user,
+            platform=platform,
+            game_id=game_data["game_id"],
+            pgn=game_data.get("pgn", ""),
+            result=game_data.get("result", "unknown").lower(),
+            white=game_data.get("white", ""),
+            black=game_data.get("black", ""),
+            opponent=game_data.get("opponent", "Unknown"),
+            opening_name=game_data.get("opening_name", "Unknown Opening"),
+            date_played=game_data.get("played_at") or game_data.get("date_played") or timezone.now()
+        )
+
+    def compute_analysis_hash(self) -> str:
+        """Return a stable digest of the stored analysis."""
+        return hashlib.blake2b(
+            json.dumps(self.analysis, sort_keys=True).encode(), digest_size=16
+        ).hexdigest()
+
+    def has_fresh_feedback(self) -> bool:
+        """Check whether the stored feedback was generated from the current analysis."""
+        return bool(self.feedback) and self.analysis_hash == self.compute_analysis_hash()
+
     class Meta:
         db_table = 'games'
         unique_together = ('user', 'platform', 'game_id')
         ordering = ['-date_played']
+        indexes = [
+            models.Index(fields=['user', '-date_played'], name='game_user_date_played_idx'),
+        ]
 
 class GameAnalysis(models.Model):
     """Model representing a game analysis."""
@@ -156,3 +212,57 @@ class Transaction(models.Model):
 
     class Meta:
         db_table = 'transactions'
+
+class AnalysisJob(models.Model):
+    """Model tracking a background analysis or game import job."""
+    JOB_TYPES = [
+        ('analysis', 'Analysis'),
+        ('batch_analysis', 'Batch Analysis'),
+        ('feedback', 'Feedback'),
+        ('fetch_games', 'Fetch Games'),
+    ]
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='analysis_jobs')
+    game = models.ForeignKey(Game, on_delete=models.SET_NULL, null=True, blank=True)
+    job_type = models.CharField(max_length=20, choices=JOB_TYPES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.job_type} job {self.id} for {self.user.username} ({self.status})"
+
+    def mark(self, status: str, result: Any = None, error: str = '') -> None:
+        """Update the job status along with its result or error."""
+        self.status = status
+        self.result = result
+        self.error = error
+        self.save(update_fields=['status', 'result', 'error', 'updated_at'])
+
+    class Meta:
+        db_table = 'analysis_jobs'
+        ordering = ['-created_at']
+
+class CreditedPayment(models.Model):
+    """Checkout session whose credits have been granted; the primary key makes crediting idempotent."""
+    session_id = models.CharField(max_length=255, primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.PROTECT, related_name='credited_payments')
+    credits = models.IntegerField()
+    # Identifies the insert that claimed the session, so a batch can tell its own rows from earlier ones
+    claim_id = models.UUIDField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.session_id} ({self.credits} credits)"
+
+    class Meta:
+        db_table = 'credited_payments'
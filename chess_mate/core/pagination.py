@@ -0,0 +1,13 @@
+"""
+Pagination classes for ChessMate application.
+"""
+
+from rest_framework.pagination import PageNumberPagination
+
+
+class GamePagination(PageNumberPagination):
+    """Page-number pagination for game listings, capped so one request never ships every game."""
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
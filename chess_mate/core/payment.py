@@ -9,26 +9,134 @@ except ImportError:
         "Failed to import stripe. Please ensure stripe is installed: pip install stripe"
     )
 
+import uuid
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CreditedPayment, Profile, Transaction
+from .credits import expire_cached_credits, get_cached_credits
+
+# Timeout (seconds) for Stripe API calls; the SDK default of 80s would pin a worker far too long
+STRIPE_REQUEST_TIMEOUT = 30
+
+
+STRIPE_API_BASE = "https://api.stripe.com/v1"
+
+
+def _build_stripe_session() -> requests.Session:
+    """
+    Build a pooled keep-alive session so Stripe calls from the same worker reuse TLS connections.
+
+    Retries are left to the SDK (``stripe.max_network_retries``), which adds idempotency
+    keys to retried POSTs.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    session.mount("https://", adapter)
+    return session
+
+STRIPE_SESSION = _build_stripe_session()
+stripe.default_http_client = stripe.RequestsClient(timeout=STRIPE_REQUEST_TIMEOUT, session=STRIPE_SESSION)
+stripe.max_network_retries = 2
+
+# Paid checkout sessions are immutable, so their verified details can be cached
+VERIFIED_SESSION_CACHE_TIMEOUT = 3600
+
+# Credited sessions are remembered for a day so repeated confirms skip Stripe and the database
+PURCHASE_CACHE_TIMEOUT = 86400
+
+# Guards against queueing the same confirmation twice; failures stay visible to pollers as long
+PURCHASE_LOCK_TIMEOUT = 30
+PURCHASE_ERROR_TIMEOUT = 600
+
+
+def purchase_cache_key(session_id: str) -> str:
+    """Cache key recording who was granted how many credits for a confirmed checkout session."""
+    return f"purchase:{session_id}"
 
-# Credit package definitions
-CREDIT_PACKAGES = {
-    'basic': {
+
+def purchase_lock_key(user_id: int, session_id: str) -> str:
+    """Cache key held while a user's confirmation for the session is queued or running."""
+    return f"purchase:{session_id}:{user_id}:lock"
+
+
+def purchase_error_key(user_id: int, session_id: str) -> str:
+    """Cache key holding the error message of a user's failed confirmation."""
+    return f"purchase:{session_id}:{user_id}:error"
+
+
+def get_cached_purchase_credits(user_id: int, session_id: str) -> Optional[int]:
+    """Credits granted for the session if the cache records it as credited to ``user_id``."""
+    entry = cache.get(purchase_cache_key(session_id))
+    if isinstance(entry, dict) and entry.get('user_id') == user_id:
+        return entry['credits']
+    return None
+
+
+class PaymentServiceUnavailable(Exception):
+    """Raised when Stripe cannot be reached."""
+
+# Credit package definitions, frozen so request handlers can share them safely
+CREDIT_PACKAGES: Mapping[str, Mapping[str, Any]] = MappingProxyType({
+    'basic': MappingProxyType({
         'name': 'Basic Package',
         'credits': 100,
         'price': 999  # in cents (9.99 USD)
-    },
-    'pro': {
+    }),
+    'pro': MappingProxyType({
         'name': 'Pro Package',
         'credits': 300,
         'price': 2499  # in cents (24.99 USD)
-    },
-    'premium': {
+    }),
+    'premium': MappingProxyType({
         'name': 'Premium Package',
         'credits': 1000,
         'price': 4999  # in cents (49.99 USD)
-    }
-}
+    })
+})
+
+# Charged amount (in cents) -> credits, so granted credits never depend on session metadata
+PACKAGES_BY_AMOUNT = MappingProxyType({package['price']: package['credits'] for package in CREDIT_PACKAGES.values()})
+
+
+def get_package(package_id: Any) -> Optional[Mapping[str, Any]]:
+    """Return the credit package with the given id, or None for unknown or malformed ids."""
+    if not isinstance(package_id, str):
+        return None
+    return CREDIT_PACKAGES.get(package_id)
+
+
+def credits_for_amount(amount: int) -> int:
+    """Return the credits bought by a charged amount, raising ValueError for unknown amounts."""
+    credits = PACKAGES_BY_AMOUNT.get(amount)
+    if credits is None:
+        raise ValueError(f"No credit package costs {amount} cents")
+    return credits
+
+def credits_for_session(session: Mapping[str, Any]) -> int:
+    """
+    Return the credits bought by a paid checkout session, raising ValueError if it matches no package.
+
+    The package comes from the checkout metadata and is checked against the pre-tax, pre-discount
+    subtotal; sessions created without a package id fall back to looking up the charged amount.
+    """
+    metadata = session.get('metadata') or {}
+    package = get_package(metadata.get('package_id'))
+    if package is None:
+        return credits_for_amount(session['amount_total'])
+    amount = session.get('amount_subtotal', session['amount_total'])
+    if amount != package['price']:
+        raise ValueError(f"Session subtotal {amount} does not match the {metadata['package_id']} package price")
+    return package['credits']
 
 class PaymentProcessor:
     @staticmethod
@@ -66,27 +174,148 @@ class PaymentProcessor:
                 }
             )
             return checkout_session
-        except stripe.error.StripeError as e:
-            raise Exception(f"Stripe error: {str(e)}")
-        except Exception as e:
-            raise Exception(f"Error creating checkout session: {str(e)}")
+        except stripe.error.APIConnectionError as e:
+            raise PaymentServiceUnavailable(f"Could not reach Stripe: {str(e)}")
+
+    @staticmethod
+    def _fetch_session_raw(session_id: str) -> Dict[str, Any]:
+        """
+        Retrieve a checkout session straight from the Stripe API, skipping StripeObject wrapping.
+
+        Errors are raised as the SDK exception types so callers handle both paths alike.
+        """
+        try:
+            response = STRIPE_SESSION.get(
+                f"{STRIPE_API_BASE}/checkout/sessions/{session_id}",
+                auth=(settings.STRIPE_SECRET_KEY, ''),
+                timeout=STRIPE_REQUEST_TIMEOUT
+            )
+        except requests.RequestException as e:
+            raise stripe.error.APIConnectionError(str(e))
+
+        if response.status_code >= 500:
+            raise stripe.error.APIError(f"Stripe returned HTTP {response.status_code}", http_status=response.status_code)
+        data = orjson.loads(response.content)
+        if response.status_code >= 400:
+            error = data.get('error', {})
+            raise stripe.error.InvalidRequestError(error.get('message', ''), error.get('param'),
+                                                   http_status=response.status_code)
+        return data
 
     @staticmethod
     def verify_payment(session_id):
-        """Verify a payment session."""
+        """
+        Verify a payment session.
+
+        Returns ``{'amount', 'credits', 'user_id'}`` for paid sessions, ``user_id`` being the
+        metadata string set at checkout, or None while the session is unpaid.
+        """
         if not settings.STRIPE_SECRET_KEY:
             raise ValueError("Stripe secret key not configured")
 
+        cache_key = f"stripe:session:{session_id}"
+        payment_data = cache.get(cache_key)
+        if payment_data is not None:
+            return payment_data
+
         try:
-            stripe.api_key = settings.STRIPE_SECRET_KEY
-            session = stripe.checkout.Session.retrieve(session_id)
-            if session.payment_status == 'paid':
-                return {
-                    'amount': session.amount_total,
-                    'credits': int(session.metadata.get('credits', 0))
+            if settings.STRIPE_RAW_SESSION_FETCH:
+                session = PaymentProcessor._fetch_session_raw(session_id)
+            else:
+                stripe.api_key = settings.STRIPE_SECRET_KEY
+                session = stripe.checkout.Session.retrieve(session_id)
+            if session['payment_status'] == 'paid':
+                metadata = session.get('metadata') or {}
+                payment_data = {
+                    'amount': session['amount_total'],
+                    'credits': credits_for_session(session),
+                    # The buyer recorded at checkout; callers must only credit this user
+                    'user_id': metadata.get('user_id')
                 }
+                # Only cache paid sessions; unpaid ones may still change state
+                cache.set(cache_key, payment_data, timeout=VERIFIED_SESSION_CACHE_TIMEOUT)
+                return payment_data
             return None
-        except stripe.error.StripeError as e:
-            raise Exception(f"Stripe error: {str(e)}")
-        except Exception as e:
-            raise Exception(f"Error verifying payment: {str(e)}") 
\ No newline at end of file
+        except stripe.error.APIConnectionError as e:
+            raise PaymentServiceUnavailable(f"Could not reach Stripe: {str(e)}") 
+
+def is_session_owner(payment_data: Dict[str, Any], user_id: int) -> bool:
+    """Whether a verified session was bought by ``user_id``, per its checkout metadata."""
+    return payment_data.get('user_id') == str(user_id)
+
+def credit_purchases(user_id: int, payments: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    """
+    Add the credits for several paid checkout sessions in one balance update.
+
+    ``payments`` maps session ids to their verified ``{'amount', 'credits'}``. Sessions that
+    were already credited are skipped. Raises Profile.DoesNotExist if the user has no profile.
+    """
+    with transaction.atomic():
+        # Claim every session with one INSERT; the primary key rejects sessions credited before
+        claim_id = uuid.uuid4()
+        CreditedPayment.objects.bulk_create([
+            CreditedPayment(session_id=session_id, user_id=user_id, credits=data['credits'], claim_id=claim_id)
+            for session_id, data in payments.items()
+        ], ignore_conflicts=True)
+        claims = list(CreditedPayment.objects.filter(
+            session_id__in=list(payments)
+        ).values_list('session_id', 'user_id', 'credits', 'claim_id'))
+
+        credited = {session_id: credits for session_id, _, credits, _ in claims}
+        owners = {session_id: owner_id for session_id, owner_id, _, _ in claims}
+        already_credited = [session_id for session_id, _, _, claimed_by in claims if claimed_by != claim_id]
+        new_payments = {
+            session_id: data for session_id, data in payments.items() if session_id not in already_credited
+        }
+
+        added_credits = sum(data['credits'] for data in new_payments.values())
+        if new_payments:
+            updated = Profile.objects.filter(user_id=user_id).update(
+                credits=F('credits') + added_credits,
+                updated_at=timezone.now()
+            )
+            if not updated:
+                raise Profile.DoesNotExist
+            expire_cached_credits(user_id)
+
+            Transaction.objects.bulk_create([
+                Transaction(
+                    user_id=user_id,
+                    transaction_type='purchase',
+                    amount=data['amount'],
+                    credits=data['credits'],
+                    status='completed',
+                    stripe_payment_id=session_id
+                )
+                for session_id, data in new_payments.items()
+            ])
+
+        transaction.on_commit(lambda: cache.set_many(
+            {
+                purchase_cache_key(sid): {'user_id': owners[sid], 'credits': credits}
+                for sid, credits in credited.items()
+            },
+            timeout=PURCHASE_CACHE_TIMEOUT
+        ))
+
+    return {
+        'credits': get_cached_credits(user_id),
+        'added_credits': added_credits,
+        'credited': credited,
+        'processed': list(new_payments),
+        'already_processed': already_credited
+    }
+
+
+def credit_purchase(user_id: int, session_id: str, amount: int, credits: int) -> Dict[str, Any]:
+    """
+    Add purchased credits to a user's balance exactly once per checkout session.
+
+    Shared by the Stripe webhook task and the synchronous confirm endpoint.
+    """
+    result = credit_purchases(user_id, {session_id: {'amount': amount, 'credits': credits}})
+    return {
+        'credits': result['credits'],
+        'added_credits': result['credited'][session_id],
+        'already_processed': bool(result['already_processed'])
+    }
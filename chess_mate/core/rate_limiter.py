@@ -9,6 +9,15 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Count a request and start the window's expiry on its first hit, atomically in one round trip
+INCR_WINDOW_SCRIPT = """
+local current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return current
+"""
+
 class RateLimiter:
     """Rate limiter implementation using Redis with fallback to Django cache."""
 
@@ -17,16 +26,17 @@ class RateLimiter:
         self.use_redis = True
         try:
             url = redis_url or settings.REDIS_URL
-            logger.info(f"Connecting to Redis at {url.split('@')[-1]}")  # Log only host:port, not credentials
+            logger.info("Connecting to Redis at %s", url.split('@')[-1])  # Log only host:port, not credentials
             self.redis = redis.Redis.from_url(url, decode_responses=True)
+            self._incr_window = self.redis.register_script(INCR_WINDOW_SCRIPT)
             # Test connection
             self.redis.ping()
             logger.info("Successfully connected to Redis")
         except (redis.ConnectionError, redis.ResponseError) as e:
-            logger.warning(f"Redis not available, falling back to Django cache: {str(e)}")
+            logger.warning("Redis not available, falling back to Django cache: %s", e)
             self.use_redis = False
         except Exception as e:
-            logger.error(f"Unexpected error connecting to Redis: {str(e)}")
+            logger.error("Unexpected error connecting to Redis: %s", e)
             self.use_redis = False
 
     def _get_cache(self):
@@ -36,7 +46,7 @@ class RateLimiter:
                 self.redis.ping()
                 return self.redis
             except Exception as e:
-                logger.error(f"Redis connection lost, falling back to Django cache: {str(e)}")
+                logger.error("Redis connection lost, falling back to Django cache: %s", e)
                 self.use_redis = False
         return cache
 
@@ -48,7 +58,7 @@ class RateLimiter:
                 settings.RATE_LIMIT['DEFAULT']
             )
         except (AttributeError, KeyError):
-            logger.warning(f"Rate limit configuration not found for {endpoint_type}, using defaults")
+            logger.warning("Rate limit configuration not found for %s, using defaults", endpoint_type)
             return {'MAX_REQUESTS': 100, 'TIME_WINDOW': 60}
 
     def is_rate_limited(self, key: str, endpoint_type: str = 'DEFAULT') -> bool:
@@ -62,18 +72,15 @@ class RateLimiter:
             window_key = f"{key}:{int(current_time / time_window)}"
             
             if self.use_redis:
-                pipe = self.redis.pipeline()
-                pipe.incr(window_key, 1)
-                pipe.expire(window_key, time_window)
-                current_requests = pipe.execute()[0]
+                current_requests = self._incr_window(keys=[window_key], args=[time_window])
             else:
-                # Using Django's cache
-                current_requests = cache.get(window_key, 0) + 1
-                cache.set(window_key, current_requests, time_window)
+                # Using Django's cache; add() only creates the counter, so concurrent workers share it
+                cache.add(window_key, 0, time_window)
+                current_requests = cache.incr(window_key)
             
             return current_requests > max_requests
         except Exception as e:
-            logger.error(f"Rate limiting error: {str(e)}")
+            logger.error("Rate limiting error: %s", e)
             return False  # Fail open
 
     def get_remaining_requests(self, key: str, endpoint_type: str = 'DEFAULT') -> int:
@@ -93,7 +100,7 @@ class RateLimiter:
             
             return max(0, max_requests - current_requests)
         except Exception as e:
-            logger.error(f"Error getting remaining requests: {str(e)}")
+            logger.error("Error getting remaining requests: %s", e)
             return 0
 
     def get_reset_time(self, key: str) -> int:
@@ -116,5 +123,5 @@ class RateLimiter:
             
             return max(0, ttl)
         except Exception as e:
-            logger.error(f"Error getting reset time: {str(e)}")
+            logger.error("Error getting reset time: %s", e)
             return 0 
\ No newline at end of file
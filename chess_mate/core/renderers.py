@@ -0,0 +1,22 @@
+"""
+Response renderers for ChessMate application.
+"""
+
+import orjson
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+_django_encoder = DjangoJSONEncoder()
+
+
+class ORJSONRenderer(BaseRenderer):
+    """JSON renderer backed by orjson, falling back to Django's encoder for types orjson lacks (e.g. Decimal)."""
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        if data is None:
+            return b""
+        return orjson.dumps(data, default=_django_encoder.default, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,27 @@
+"""
+Request body serializers for ChessMate API endpoints.
+"""
+
+from rest_framework import serializers
+
+# Upper bound on checkout sessions confirmed by one batch request
+MAX_BATCH_PURCHASES = 20
+
+
+class ConfirmPurchaseSerializer(serializers.Serializer):
+    """Body of a single purchase confirmation."""
+    session_id = serializers.CharField(max_length=255)
+
+
+class ConfirmPurchasesSerializer(serializers.Serializer):
+    """Body of a batch purchase confirmation."""
+    session_ids = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False,
+        max_length=MAX_BATCH_PURCHASES
+    )
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Body of an access token refresh."""
+    refresh = serializers.CharField()
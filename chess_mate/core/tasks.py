@@ -1,71 +1,452 @@
 from celery import shared_task
 from typing import Dict, Any, List, Optional
 import logging
-from .models import Game, Profile
-from .game_analyzer import GameAnalyzer
+import queue
+import time
+import stripe
+from .models import Game, Profile, Transaction, AnalysisJob
+from .game_analyzer import GameAnalyzer, analyze_games_in_parallel
+from .engine_pool import ENGINE_POOL
 from .cache_manager import CacheManager
-from .ai_feedback import AIFeedbackGenerator
-from django.db import transaction
+from .credits import expire_cached_credits
+from .ai_feedback import generate_dynamic_feedback, get_feedback_generator
+from .chess_services import fetch_games_cached, invalidate_games_cache, save_games
+from .utils import generate_feedback_without_ai
+from .payment import (
+    PaymentProcessor, PaymentServiceUnavailable, PURCHASE_ERROR_TIMEOUT, credit_purchase,
+    is_session_owner, purchase_error_key, purchase_lock_key
+)
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.conf import settings
+from django.utils import timezone
+from django.contrib.auth.models import User
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from smtplib import SMTPException
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 cache_manager = CacheManager()
 
-@shared_task(bind=True, max_retries=3)
-def analyze_game_task(self, game_id: int, user_id: int) -> Dict[str, Any]:
-    """Analyze a single game asynchronously."""
+@shared_task(bind=True)
+def analyze_game_task(self, job_id: int, game_id: int, user_id: int, depth: int = 20, use_ai: bool = True) -> Dict[str, Any]:
+    """Analyze a single game in the background and record the outcome on its AnalysisJob."""
+    job = AnalysisJob.objects.select_related('user').get(id=job_id)
+    if job.status in ('completed', 'failed'):
+        # Late acks can redeliver a finished job; it must not be analysed or charged again
+        return job.result or {}
+    job.mark('running')
+    user = job.user
+
     try:
-        # Check cache first
-        cached_analysis = cache_manager.get_cached_analysis(game_id)
-        if cached_analysis:
-            return cached_analysis
+        game = Game.objects.get(id=game_id, user_id=user_id)
+        profile = Profile.objects.get(user_id=user_id)
+        if profile.credits < 1:  # Analysis costs 1 credit
+            job.mark('failed', error="Insufficient credits. Please purchase more credits to analyze games.")
+            return {}
+
+        # Borrow a warm engine from the shared pool; give up after a bounded wait rather than
+        # holding a worker slot while every engine is busy
+        try:
+            with ENGINE_POOL.engine(timeout=settings.ENGINE_ACQUIRE_TIMEOUT) as engine:
+                analyzer = GameAnalyzer(engine=engine)
+                logger.info("Analyzing game %s", game_id)
+                start_time = time.perf_counter_ns()
+
+                analysis_results = analyzer.analyze_games([game], depth=depth)
+
+                analysis_time = (time.perf_counter_ns() - start_time) / 1e9
+                logger.info("Analysis completed in %.2f seconds", analysis_time)
+
+                if not analysis_results or game_id not in analysis_results:
+                    job.mark('failed', error="Analysis failed to produce results.")
+                    return {}
+
+                # Generate comprehensive feedback
+                feedback = analyzer.generate_feedback(analysis_results[game_id])
+        except queue.Empty:
+            logger.warning("No Stockfish engine free to analyze game %s", game_id)
+            job.mark('failed', error="All analysis engines are busy. Please try again shortly.")
+            return {}
+
+        fallback_stats = {
+            "average_accuracy": feedback.get("opening", {}).get("accuracy", 0),
+            "common_mistakes": {
+                "blunders": feedback.get("blunders", 0),
+                "mistakes": feedback.get("mistakes", 0),
+                "inaccuracies": feedback.get("inaccuracies", 0),
+                "time_pressure": len(feedback.get("time_management", {}).get("time_pressure_moves", []))
+            }
+        }
+
+        # Try AI feedback if requested
+        if use_ai:
+            try:
+                feedback["ai_suggestions"] = get_feedback_generator().generate_personalized_feedback(
+                    game_analysis=analysis_results[game_id],
+                    player_profile={
+                        "username": user.username,
+                        "rating": profile.rating,
+                        "total_games": profile.total_games()
+                    }
+                )
+            except Exception as e:
+                logger.warning("AI feedback generation failed, falling back to standard analysis: %s", str(e))
+                feedback["ai_suggestions"] = generate_feedback_without_ai(analysis_results[game_id], fallback_stats)
+        else:
+            feedback["ai_suggestions"] = generate_feedback_without_ai(analysis_results[game_id], fallback_stats)
 
-        # Get game and profile
         with transaction.atomic():
-            game = Game.objects.get(id=game_id)
-            profile = Profile.objects.get(user_id=user_id)
-            
-            # Verify credits
-            if profile.credits < 1:
-                raise ValueError("Insufficient credits")
-            
-            # Deduct credits
-            profile.credits -= 1
-            profile.save()
+            # Lock the job so a redelivered copy finishing at the same time cannot charge twice
+            status = AnalysisJob.objects.select_for_update().values_list('status', flat=True).get(id=job_id)
+            if status == 'completed':
+                return AnalysisJob.objects.values_list('result', flat=True).get(id=job_id)
+
+            # Deduct the credit against the current balance; the profile loaded above may be stale
+            charged = Profile.objects.filter(user_id=user_id, credits__gte=1).update(credits=F('credits') - 1)
+            if not charged:
+                job.mark('failed', error="Insufficient credits. Please purchase more credits to analyze games.")
+                return {}
+            expire_cached_credits(user_id)
+
+            # Update game with analysis results and feedback
+            game.analysis = analysis_results[game_id]
+            game.feedback = feedback
+            game.analysis_hash = game.compute_analysis_hash()
+            game.save()
+
+            Transaction.objects.create(
+                user=user,
+                transaction_type='analysis',
+                credits=1,
+                status='completed'
+            )
+
+            result = {
+                "message": "Analysis completed successfully!",
+                "analysis": analysis_results[game_id],
+                "feedback": feedback,
+                "credits_remaining": Profile.objects.values_list('credits', flat=True).get(user_id=user_id)
+            }
+            job.mark('completed', result=result)
+        return result
+    except Exception as e:
+        logger.error("Error in analyze_game_task: %s", str(e), exc_info=True)
+        job.mark('failed', error="Analysis failed. Please try again later.")
+        return {}
+
+# Batch progress outlives the job only long enough for a slow poller to read the final count
+ANALYSIS_PROGRESS_TIMEOUT = 60 * 60
+
+def analysis_progress_key(job_id: int) -> str:
+    """Cache key holding the progress of a batch analysis job."""
+    return f"analysis:{job_id}:progress"
 
-        # Perform analysis
-        analyzer = GameAnalyzer()
+@shared_task(bind=True)
+def batch_analyze_task(self, job_id: int, user_id: int, num_games: int, depth: int = 20, use_ai: bool = True) -> Dict[str, Any]:
+    """Analyze the user's most recent games in the background and record the outcome on its AnalysisJob."""
+    job = AnalysisJob.objects.select_related('user__profile').get(id=job_id)
+    if job.status in ('completed', 'failed'):
+        # Late acks can redeliver a finished job; it must not be analysed again
+        return job.result or {}
+    job.mark('running')
+    user = job.user
+
+    try:
+        games = list(Game.objects.filter(user_id=user_id).only(
+            "id", "pgn", "result", "date_played"
+        ).order_by("-date_played")[:num_games])
+
+        progress_key = analysis_progress_key(job_id)
+
+        def report_progress(done: int) -> None:
+            cache.set(progress_key, {"current": done, "total": len(games)}, timeout=ANALYSIS_PROGRESS_TIMEOUT)
+
+        report_progress(0)
+        logger.info("Starting batch analysis for user %s with %d games.", user_id, len(games))
+        # Games are spread over the free pooled engines; give up after a bounded wait rather than
+        # holding a worker slot while another batch has every engine
         try:
-            analysis_results = analyzer.analyze_games([game])
-            game_analysis = analysis_results[game.id]
-            
-            # Generate AI feedback
-            ai_feedback = AIFeedbackGenerator()
-            player_profile = {
-                'rating': profile.rating,
-                'preferred_openings': profile.preferred_openings,
-                'recent_performance': profile.recent_performance
+            analysis_results = analyze_games_in_parallel(
+                games, depth=depth, acquire_timeout=settings.ENGINE_ACQUIRE_TIMEOUT,
+                on_progress=report_progress
+            )
+        except queue.Empty:
+            logger.warning("No Stockfish engine free for batch analysis of user %s", user_id)
+            job.mark('failed', error="All analysis engines are busy. Please try again shortly.")
+            return {}
+
+        # Generate comprehensive feedback for each game
+        feedback_results = {}
+        overall_stats = {
+            "total_games": len(games),
+            "wins": 0,
+            "losses": 0,
+            "draws": 0,
+            "average_accuracy": 0,
+            "common_mistakes": {
+                "blunders": 0,
+                "mistakes": 0,
+                "inaccuracies": 0,
+                "time_pressure": 0
+            },
+            "improvement_areas": [],
+            "strengths": []
+        }
+
+        # Single pass over the analysed games with plain counters; stats are written once at the end
+        # and the analysed games are saved together afterwards
+        updated_games = []
+        # bulk_update skips auto_now, so updated_at is set by hand for the saved-games ETag
+        now = timezone.now()
+        wins = losses = draws = 0
+        blunders_total = mistakes_total = inaccuracies_total = time_pressure_games = 0
+        total_good_moves = 0
+        total_moves = 0
+        for game in games:
+            game_analysis = analysis_results.get(game.id)
+            if game_analysis is None:
+                continue
+
+            game.analysis = game_analysis
+            game.updated_at = now
+            updated_games.append(game)
+
+            game_feedback = GameAnalyzer.generate_feedback(game_analysis)
+            feedback_results[game.id] = game_feedback
+
+            if game.result == "win":
+                wins += 1
+            elif game.result == "loss":
+                losses += 1
+            else:
+                draws += 1
+
+            blunders = game_feedback.get("blunders", 0)
+            mistakes = game_feedback.get("mistakes", 0)
+            inaccuracies = game_feedback.get("inaccuracies", 0)
+            blunders_total += blunders
+            mistakes_total += mistakes
+            inaccuracies_total += inaccuracies
+
+            if game_analysis and len(game_feedback["time_management"]["time_pressure_moves"]) > 3:
+                time_pressure_games += 1
+
+            # Accuracy: blunders count triple, mistakes double, inaccuracies once
+            moves = len(game_feedback.get("opening", {}).get("played_moves", []))
+            total_moves += moves
+            total_good_moves += max(0, moves - (blunders * 3 + mistakes * 2 + inaccuracies))
+
+        # Save analysis results to the database in a single multi-row UPDATE
+        with transaction.atomic():
+            Game.objects.bulk_update(updated_games, ['analysis', 'updated_at'], batch_size=100)
+
+        overall_stats["wins"] = wins
+        overall_stats["losses"] = losses
+        overall_stats["draws"] = draws
+
+        # Calculate averages
+        num_analyzed_games = len(feedback_results)
+        if num_analyzed_games > 0:
+            overall_stats["average_accuracy"] = (total_good_moves / total_moves * 100) if total_moves > 0 else 0
+            overall_stats["common_mistakes"] = {
+                "blunders": blunders_total / num_analyzed_games,
+                "mistakes": mistakes_total / num_analyzed_games,
+                "inaccuracies": inaccuracies_total / num_analyzed_games,
+                "time_pressure": time_pressure_games / num_analyzed_games
             }
-            feedback = ai_feedback.generate_personalized_feedback(game_analysis, player_profile)
-            
-            # Combine results
-            results = {
-                'analysis': game_analysis,
-                'feedback': feedback,
-                'timestamp': datetime.now().isoformat()
+
+            # Generate improvement areas
+            if overall_stats["common_mistakes"]["blunders"] > 0.5:
+                overall_stats["improvement_areas"].append({
+                    "area": "Tactical Awareness",
+                    "description": "Focus on reducing tactical oversights and blunders. Consider practicing tactical puzzles daily."
+                })
+            if overall_stats["common_mistakes"]["mistakes"] > 1:
+                overall_stats["improvement_areas"].append({
+                    "area": "Strategic Planning",
+                    "description": "Work on positional understanding and long-term planning. Study master games in your preferred openings."
+                })
+            if overall_stats["common_mistakes"]["time_pressure"] > 0.3:
+                overall_stats["improvement_areas"].append({
+                    "area": "Time Management",
+                    "description": "Improve time management, especially in critical positions. Practice playing games with increment."
+                })
+
+            # Identify strengths
+            if overall_stats["average_accuracy"] > 70:
+                overall_stats["strengths"].append({
+                    "area": "Overall Accuracy",
+                    "description": "Strong overall play with consistent move quality"
+                })
+            if overall_stats["wins"] / num_analyzed_games > 0.5:
+                overall_stats["strengths"].append({
+                    "area": "Competitive Performance",
+                    "description": "Good win rate showing strong competitive ability"
+                })
+            if overall_stats["common_mistakes"]["blunders"] < 0.3:
+                overall_stats["strengths"].append({
+                    "area": "Tactical Solidity",
+                    "description": "Strong tactical awareness with few major oversights"
+                })
+            if overall_stats["common_mistakes"]["time_pressure"] < 0.2:
+                overall_stats["strengths"].append({
+                    "area": "Time Management",
+                    "description": "Excellent time management across games"
+                })
+
+        # Generate feedback (with or without AI)
+        if use_ai:
+            try:
+                # The profile is loaded with the job; every user gets one when the account is created
+                profile = user.profile
+
+                # Generate AI feedback using the feedback generator
+                ai_feedback = get_feedback_generator().generate_personalized_feedback(
+                    game_analysis=analysis_results,
+                    player_profile={
+                        "username": user.username,
+                        "rating": profile.rating,
+                        "total_games": profile.total_games()
+                    }
+                )
+                dynamic_feedback = ai_feedback
+            except Exception as e:
+                logger.error("Error generating AI feedback: %s", str(e))
+                # Fall back to non-AI feedback
+                dynamic_feedback = generate_feedback_without_ai(analysis_results, overall_stats)
+                overall_stats["ai_error"] = "AI feedback unavailable - using standard analysis"
+        else:
+            # Use non-AI feedback by default
+            dynamic_feedback = generate_feedback_without_ai(analysis_results, overall_stats)
+
+        result = {
+            "message": "Batch analysis completed!",
+            "results": {
+                "individual_games": feedback_results,
+                "overall_stats": overall_stats,
+                "dynamic_feedback": dynamic_feedback
             }
-            
-            # Cache results
-            cache_manager.cache_analysis(game_id, results)
-            
-            return results
-        finally:
-            if analyzer:
-                analyzer.close_engine()
-                
+        }
+        job.mark('completed', result=result)
+        return result
     except Exception as e:
-        logger.error(f"Error in analyze_game_task: {str(e)}")
-        self.retry(exc=e, countdown=60)  # Retry after 1 minute
+        logger.error("Error in batch_analyze_task: %s", str(e), exc_info=True)
+        job.mark('failed', error="Batch analysis failed. Please try again later.")
+        return {}
+
+@shared_task(bind=True)
+def dynamic_feedback_task(self, job_id: int, game_id: int) -> Dict[str, Any]:
+    """Build the OpenAI-refined feedback summary for a game and record it on its AnalysisJob."""
+    job = AnalysisJob.objects.get(id=job_id)
+    if job.status in ('completed', 'failed'):
+        return job.result or {}
+    job.mark('running')
+
+    try:
+        analysis = Game.objects.values_list('analysis', flat=True).get(id=game_id, user_id=job.user_id)
+        # Game.feedback holds the analyzer's feedback, so this summary is only kept on the job;
+        # the OpenAI completion behind it is already cached by prompt
+        result = {"feedback": generate_dynamic_feedback({game_id: analysis})}
+        job.mark('completed', result=result)
+        return result
+    except Exception as e:
+        logger.error("Error in dynamic_feedback_task: %s", str(e), exc_info=True)
+        job.mark('failed', error="Feedback generation failed. Please try again later.")
+        return {}
+
+@shared_task(bind=True)
+def fetch_games_task(self, job_id: int, user_id: int, platform: str, username: str,
+                     game_mode: str = "all", num_games: int = 10) -> Dict[str, Any]:
+    """Import games from Chess.com or Lichess in the background and record the outcome on its AnalysisJob."""
+    job = AnalysisJob.objects.select_related('user').get(id=job_id)
+    job.mark('running')
+    user = job.user
+
+    try:
+        games = fetch_games_cached(platform, username, game_mode, limit=num_games)
+        logger.info("Fetched %d games from %s for user %s", len(games or []), platform, username)
+    except Exception as e:
+        logger.error("Error fetching games from %s: %s", platform, str(e))
+        job.mark('failed', error=f"Failed to fetch games from {platform}. Please try again later.")
+        return {}
+
+    if not games:
+        result = {"message": "No games found for the given username and criteria.", "games_saved": 0, "games": []}
+        job.mark('completed', result=result)
+        return result
+
+    try:
+        # Unlocked pre-check; the conditional UPDATE below is what actually guards the balance
+        credits = Profile.objects.values_list('credits', flat=True).get(user_id=user_id)
+        if credits < num_games:
+            job.mark('failed', error=f"Not enough credits. Required: {num_games}, Available: {credits}")
+            return {}
+
+        charged = True
+        with transaction.atomic():
+            new_games = save_games(user, platform, games, limit=num_games)
+            saved_count = len(new_games)
+            saved_games = [
+                {
+                    "id": game.id,
+                    "platform": game.platform,
+                    "white": game.white,
+                    "black": game.black,
+                    "opponent": game.opponent,
+                    "result": game.result,
+                    "date_played": game.date_played,
+                    "opening_name": game.opening_name,
+                    "game_id": game.game_id
+                }
+                for game in new_games
+            ]
+
+            if saved_count > 0:
+                charged = Profile.objects.filter(
+                    user_id=user_id, credits__gte=saved_count
+                ).update(credits=F('credits') - saved_count)
+            if not charged:
+                # The credits were spent elsewhere since the pre-check, so the import is undone too
+                transaction.set_rollback(True)
+            elif saved_count > 0:
+                expire_cached_credits(user_id)
+
+                Transaction.objects.create(
+                    user=user,
+                    transaction_type='usage',
+                    credits=saved_count,
+                    status='completed'
+                )
+                logger.info("Successfully saved %d games for user %s", saved_count, user.username)
+                # Let the next import pick up games played since this listing was fetched
+                transaction.on_commit(lambda: invalidate_games_cache(platform, username, game_mode, num_games))
+                message = f"Successfully fetched and saved {saved_count} games!"
+            else:
+                logger.warning("No new games were saved for user %s", user.username)
+                message = "No new games were saved. They might already exist in your account."
+
+        if not charged:
+            job.mark('failed', error=f"Not enough credits. Required: {saved_count}")
+            return {}
+
+        result = {
+            "message": message,
+            "games_saved": saved_count,
+            "credits_deducted": saved_count,
+            "credits_remaining": Profile.objects.values_list('credits', flat=True).get(user_id=user_id),
+            "games": saved_games
+        }
+        job.mark('completed', result=result)
+        return result
+    except Exception as e:
+        logger.error("Error in fetch_games_task: %s", str(e), exc_info=True)
+        job.mark('failed', error="Failed to fetch games. Please try again later.")
+        return {}
 
 @shared_task(bind=True, max_retries=3)
 def analyze_batch_games_task(self, game_ids: List[int], user_id: int) -> Dict[str, Any]:
@@ -80,66 +461,68 @@ def analyze_batch_games_task(self, game_ids: List[int], user_id: int) -> Dict[st
             }
         }
         
-        # Get profile and verify credits
+        # Verify and deduct credits in one conditional update
         with transaction.atomic():
-            profile = Profile.objects.get(user_id=user_id)
             required_credits = len(game_ids)
-            
-            if profile.credits < required_credits:
+            charged = Profile.objects.filter(
+                user_id=user_id, credits__gte=required_credits
+            ).update(credits=F('credits') - required_credits)
+
+            if not charged:
                 raise ValueError("Insufficient credits")
-            
-            # Deduct credits
-            profile.credits -= required_credits
-            profile.save()
+            expire_cached_credits(user_id)
+            profile = Profile.objects.get(user_id=user_id)
         
-        analyzer = GameAnalyzer()
         try:
-            # Process games in batches
-            batch_size = 5
-            for i in range(0, len(game_ids), batch_size):
-                batch = game_ids[i:i + batch_size]
-                games = Game.objects.filter(id__in=batch)
+            with ENGINE_POOL.engine(timeout=settings.ENGINE_ACQUIRE_TIMEOUT) as engine:
+                analyzer = GameAnalyzer(engine=engine)
+                # Process games in batches
+                batch_size = 5
+                for i in range(0, len(game_ids), batch_size):
+                    batch = game_ids[i:i + batch_size]
+                    games = Game.objects.filter(id__in=batch)
                 
-                try:
-                    # Analyze batch
-                    batch_results = analyzer.analyze_games(games)
+                    try:
+                        # Analyze batch
+                        batch_results = analyzer.analyze_games(games)
                     
-                    # Process each game in batch
-                    for game_id, analysis in batch_results.items():
-                        try:
-                            # Generate AI feedback
-                            ai_feedback = AIFeedbackGenerator()
-                            player_profile = {
-                                'rating': profile.rating,
-                                'preferred_openings': profile.preferred_openings,
-                                'recent_performance': profile.recent_performance
-                            }
-                            feedback = ai_feedback.generate_personalized_feedback(analysis, player_profile)
+                        # Process each game in batch
+                        for game_id, analysis in batch_results.items():
+                            try:
+                                # Generate AI feedback
+                                player_profile = {
+                                    'rating': profile.rating,
+                                    'preferred_openings': profile.preferred_openings,
+                                    'recent_performance': profile.recent_performance
+                                }
+                                feedback = get_feedback_generator().generate_personalized_feedback(analysis, player_profile)
                             
-                            # Store results
-                            game_results = {
-                                'analysis': analysis,
-                                'feedback': feedback,
-                                'timestamp': datetime.now().isoformat()
-                            }
+                                # Store results
+                                game_results = {
+                                    'analysis': analysis,
+                                    'feedback': feedback,
+                                    'timestamp': datetime.now().isoformat()
+                                }
                             
-                            results['individual_games'][game_id] = game_results
-                            results['overall_stats']['completed'] += 1
+                                results['individual_games'][game_id] = game_results
+                                results['overall_stats']['completed'] += 1
                             
-                            # Cache individual game results
-                            cache_manager.cache_analysis(game_id, game_results)
+                                # Cache individual game results
+                                cache_manager.cache_analysis(game_id, game_results)
                             
-                        except Exception as e:
-                            logger.error(f"Error processing game {game_id}: {str(e)}")
-                            results['overall_stats']['errors'] += 1
+                            except Exception as e:
+                                logger.error("Error processing game %s: %s", game_id, e)
+                                results['overall_stats']['errors'] += 1
                             
-                except Exception as e:
-                    logger.error(f"Error processing batch: {str(e)}")
-                    results['overall_stats']['errors'] += len(batch)
-                    
-        finally:
-            if analyzer:
-                analyzer.close_engine()
+                    except Exception as e:
+                        logger.error("Error processing batch: %s", e)
+                        results['overall_stats']['errors'] += len(batch)
+        except queue.Empty:
+            # Nothing was analysed, so hand back the credits charged above
+            logger.warning("No Stockfish engine free for batch analysis of user %s", user_id)
+            Profile.objects.filter(user_id=user_id).update(credits=F('credits') + required_credits)
+            expire_cached_credits(user_id)
+            return {'error': "All analysis engines are busy. Please try again shortly."}
         
         # Calculate overall statistics
         total_mistakes = sum(
@@ -160,7 +543,7 @@ def analyze_batch_games_task(self, game_ids: List[int], user_id: int) -> Dict[st
         return results
         
     except Exception as e:
-        logger.error(f"Error in analyze_batch_games_task: {str(e)}")
+        logger.error("Error in analyze_batch_games_task: %s", e)
         self.retry(exc=e, countdown=60)  # Retry after 1 minute
 
 @shared_task
@@ -169,7 +552,7 @@ def cleanup_expired_cache_task() -> None:
     try:
         cache_manager.clear_all_caches()
     except Exception as e:
-        logger.error(f"Error in cleanup_expired_cache_task: {str(e)}")
+        logger.error("Error in cleanup_expired_cache_task: %s", e)
 
 @shared_task
 def update_user_stats_task(user_id: int) -> None:
@@ -195,4 +578,110 @@ def update_user_stats_task(user_id: int) -> None:
             profile.save()
             
     except Exception as e:
-        logger.error(f"Error in update_user_stats_task: {str(e)}") 
\ No newline at end of file
+        logger.error("Error in update_user_stats_task: %s", e)
+
+@shared_task(bind=True, autoretry_for=(SMTPException, ConnectionError), retry_backoff=True, max_retries=5)
+def send_verification_email_task(self, user_id: int, domain: str, protocol: str = 'http') -> None:
+    """Send the account verification email for a newly registered user."""
+    user = User.objects.select_related('profile').get(id=user_id)
+    token = user.profile.email_verification_token
+    verification_url = f"{protocol}://{domain}/verify-email/{urlsafe_base64_encode(force_bytes(user.pk))}/{token}"
+
+    subject = "Verify Your Email - ChessMate"
+    html_message = render_to_string('email/verify_email.html', {
+        'user': user,
+        'verification_url': verification_url,
+        'domain': domain,
+    })
+
+    # Create plain text version
+    text_message = f"""
+        Hello {user.username},
+        
+        Thank you for registering with ChessMate. To complete your registration and activate your account, please visit:
+        
+        {verification_url}
+        
+        This verification link will expire in 7 days.
+        
+        If you did not create an account with ChessMate, please ignore this email.
+        """
+
+    logger.info("Attempting to send verification email to %s", user.email)
+    try:
+        send_mail(
+            subject=subject,
+            message=text_message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[user.email],
+            fail_silently=False,
+            html_message=html_message
+        )
+    except Exception as e:
+        logger.error("Failed to send verification email to %s. Error: %s", user.email, str(e))
+        logger.error("Email settings: HOST=%s, PORT=%s, FROM=%s", settings.EMAIL_HOST, settings.EMAIL_PORT, settings.DEFAULT_FROM_EMAIL)
+        raise
+    logger.info("Successfully sent verification email to %s", user.email)
+
+
+@shared_task(autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=5)
+def record_transaction_task(user_id: int, transaction_type: str, credits: int, amount: int = 0,
+                            status: str = 'completed') -> None:
+    """Write a credit Transaction row for a balance change already applied to the profile."""
+    Transaction.objects.create(
+        user_id=user_id,
+        transaction_type=transaction_type,
+        amount=amount,
+        credits=credits,
+        status=status
+    )
+
+
+@shared_task(bind=True, autoretry_for=(ConnectionError,), retry_backoff=True, max_retries=5)
+def credit_purchase_task(self, user_id: int, session_id: str, amount: int, credits: int) -> Dict[str, Any]:
+    """Grant the credits for a paid checkout session reported by the Stripe webhook."""
+    result = credit_purchase(user_id, session_id, amount, credits)
+    if result['already_processed']:
+        logger.info("Checkout session %s was already credited", session_id)
+    else:
+        logger.info("Credited %s credits to user %s for session %s", credits, user_id, session_id)
+    return result
+
+
+@shared_task(bind=True, max_retries=5)
+def confirm_purchase_task(self, user_id: int, session_id: str) -> None:
+    """Verify a checkout session with Stripe and credit it, recording failures for the status endpoint."""
+    error = None
+    try:
+        payment_data = PaymentProcessor.verify_payment(session_id)
+        if payment_data and not is_session_owner(payment_data, user_id):
+            logger.warning("User %s tried to confirm session %s bought by another user", user_id, session_id)
+            error = "Checkout session not found"
+        elif payment_data:
+            result = credit_purchase(user_id, session_id, payment_data['amount'], payment_data['credits'])
+            logger.info("Purchase %s confirmed for user %s, balance %s", session_id, user_id, result['credits'])
+        else:
+            logger.error("Invalid or expired session: %s", session_id)
+            error = "Invalid or expired session"
+    except PaymentServiceUnavailable as e:
+        if self.request.retries < self.max_retries:
+            # The lock stays held so repeat confirms keep polling this retry
+            raise self.retry(exc=e, countdown=2 ** self.request.retries)
+        logger.exception("Stripe unavailable while confirming %s", session_id)
+        error = "Payment provider unavailable, please retry"
+    except stripe.error.InvalidRequestError:
+        logger.exception("Unknown checkout session %s", session_id)
+        error = "Checkout session not found"
+    except stripe.error.StripeError:
+        logger.exception("Stripe error while confirming %s", session_id)
+        error = "Error verifying payment"
+    except (KeyError, TypeError, ValueError):
+        logger.exception("Malformed payment data for session %s", session_id)
+        error = "Invalid payment metadata"
+    except Profile.DoesNotExist:
+        logger.exception("Profile not found for user %s", user_id)
+        error = "Profile not found"
+
+    if error:
+        cache.set(purchase_error_key(user_id, session_id), error, timeout=PURCHASE_ERROR_TIMEOUT)
+    cache.delete(purchase_lock_key(user_id, session_id))
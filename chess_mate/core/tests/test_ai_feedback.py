@@ -0,0 +1,55 @@
+from unittest.mock import MagicMock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from core.ai_feedback import AIFeedbackGenerator, cached_completion
+
+
+class TestCachedCompletion(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = MagicMock()
+        self.client.chat.completions.create.return_value.choices[0].message.content = "Study rook endgames."
+
+    def test_identical_requests_hit_openai_once(self):
+        """Test that a repeated prompt is answered from the cache."""
+        request = {"model": "gpt-3.5-turbo", "messages": [{"role": "user", "content": "Analyze"}], "temperature": 0.7}
+
+        first = cached_completion(self.client, **request)
+        second = cached_completion(self.client, **request)
+
+        self.assertEqual(first, "Study rook endgames.")
+        self.assertEqual(second, first)
+        self.client.chat.completions.create.assert_called_once()
+
+    def test_different_prompts_are_not_shared(self):
+        """Test that different prompts get their own completion."""
+        cached_completion(self.client, model="gpt-3.5-turbo", messages=[{"role": "user", "content": "A"}])
+        cached_completion(self.client, model="gpt-3.5-turbo", messages=[{"role": "user", "content": "B"}])
+
+        self.assertEqual(self.client.chat.completions.create.call_count, 2)
+
+
+class TestBatchFeedback(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.generator = AIFeedbackGenerator(api_key="test")
+        self.generator.client = MagicMock()
+        self.analysis = [{"move_number": 1, "move": "e4", "score": 30, "time_spent": 5}]
+
+    def test_games_share_one_request(self):
+        """Test that feedback for several games comes from a single JSON-mode completion."""
+        self.generator.client.chat.completions.create.return_value.choices[0].message.content = (
+            '{"feedback_by_game_id": {"1": "1. Opening\\n- Develop knights first", "2": "4. Time management\\n- Move faster"}}'
+        )
+
+        feedback = self.generator.generate_batch_feedback({1: self.analysis, 2: self.analysis, 3: self.analysis}, {"username": "p"})
+
+        self.generator.client.chat.completions.create.assert_called_once()
+        request = self.generator.client.chat.completions.create.call_args.kwargs
+        self.assertEqual(request["response_format"], {"type": "json_object"})
+        self.assertEqual(feedback[1]["opening"]["suggestions"], ["Develop knights first"])
+        self.assertEqual(feedback[2]["time_management"]["suggestions"], ["Move faster"])
+        # Games missing from the answer fall back to generic feedback
+        self.assertEqual(feedback[3]["opening"]["analysis"], "Analysis unavailable")
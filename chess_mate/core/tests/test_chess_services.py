@@ -0,0 +1,122 @@
+from unittest.mock import MagicMock, patch
+
+import requests
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core.chess_services import ChessComService, LichessService, fetch_games_cached, invalidate_games_cache, save_games
+from core.models import Game
+
+
+class TestFetchGamesCache(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    @patch('core.chess_services.ChessComService.fetch_games')
+    def test_repeated_fetch_is_served_from_cache(self, mock_fetch):
+        """Test that identical fetch requests only hit the upstream API once."""
+        mock_fetch.return_value = [{"game_id": "123", "platform": "chess.com"}]
+
+        first = fetch_games_cached("chess.com", "Magnus", "blitz", limit=5)
+        second = fetch_games_cached("chess.com", "magnus", "blitz", limit=5)
+
+        self.assertEqual(first, second)
+        mock_fetch.assert_called_once_with("Magnus", "blitz", limit=5)
+
+    @patch('core.chess_services.LichessService.fetch_games')
+    def test_invalidate_forces_upstream_fetch(self, mock_fetch):
+        """Test that invalidating a listing makes the next fetch hit the upstream API."""
+        mock_fetch.return_value = []
+
+        fetch_games_cached("lichess", "magnus")
+        invalidate_games_cache("lichess", "magnus")
+        fetch_games_cached("lichess", "magnus")
+
+        self.assertEqual(mock_fetch.call_count, 2)
+
+
+class TestChessComArchives(SimpleTestCase):
+    @patch('core.chess_services.SESSION.get')
+    def test_archives_are_yielded_newest_first_and_failures_skipped(self, mock_get):
+        """Test that concurrently fetched archives keep their order and a failed month is skipped."""
+        def get(url, timeout):
+            response = MagicMock()
+            if url.endswith("2024/02"):
+                response.raise_for_status.side_effect = requests.HTTPError("502")
+            response.json.return_value = {"games": [{"url": url}]}
+            return response
+
+        mock_get.side_effect = get
+        urls = [f"https://api.chess.com/pub/player/magnus/games/2024/0{month}" for month in (3, 2, 1)]
+
+        archives = list(ChessComService._iter_archive_games(urls))
+
+        self.assertEqual([url for url, _ in archives], [urls[0], urls[2]])
+
+
+class TestLichessStream(SimpleTestCase):
+    def test_stops_reading_lines_at_limit(self):
+        """Test that NDJSON lines past the limit are never read."""
+        lines = iter([
+            b'{"id": "a1", "players": {"white": {"user": {"name": "magnus"}}}, "winner": "white"}',
+            b'',
+            b'{"id": "b2", "players": {"black": {"user": {"name": "magnus"}}}}',
+            b'not json',
+        ])
+
+        games = LichessService._format_games(lines, "magnus", limit=2)
+
+        self.assertEqual([game["game_id"] for game in games], ["a1", "b2"])
+        self.assertEqual(next(lines), b'not json')
+
+
+class TestSaveGames(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="importer", password="testpass123")
+        Game.objects.create(
+            user=self.user, platform="lichess", game_id="existing", pgn="1. e4",
+            result="win", white="importer", black="rival", date_played=timezone.now()
+        )
+
+    def test_skips_existing_and_duplicate_games(self):
+        """Test that already imported and repeated games are not saved again."""
+        games = [
+            {"game_id": "existing", "pgn": "1. e4"},
+            {"game_id": "new-1", "pgn": "1. d4"},
+            {"game_id": "new-1", "pgn": "1. d4"},
+            {"pgn": "1. c4"},
+            {"game_id": "new-2", "pgn": "1. Nf3"},
+        ]
+
+        # Lookup, then the INSERT inside its savepoint
+        with self.assertNumQueries(4):
+            saved = save_games(self.user, "lichess", games)
+
+        self.assertEqual([game.game_id for game in saved], ["new-1", "new-2"])
+        self.assertEqual(Game.objects.filter(user=self.user).count(), 3)
+
+    def test_respects_limit(self):
+        """Test that no more than limit new games are saved."""
+        games = [{"game_id": f"g{i}"} for i in range(5)]
+
+        saved = save_games(self.user, "lichess", games, limit=2)
+
+        self.assertEqual(len(saved), 2)
+
+    def test_games_saved_by_a_concurrent_import_are_skipped(self):
+        """Test that a clash with games another import just saved is resolved by deduplicating again."""
+        games = [{"game_id": "existing"}, {"game_id": "new-1"}]
+        filter_games = Game.objects.filter
+        lookups = [Game.objects.none()]
+
+        def stale_first_lookup(*args, **kwargs):
+            # The first lookup runs before the other import commits "existing"
+            return lookups.pop() if lookups else filter_games(*args, **kwargs)
+
+        with patch.object(Game.objects, "filter", side_effect=stale_first_lookup):
+            saved = save_games(self.user, "lichess", games)
+
+        self.assertEqual([game.game_id for game in saved], ["new-1"])
+        self.assertEqual(Game.objects.filter(user=self.user).count(), 2)
@@ -0,0 +1,385 @@
+import uuid
+from unittest.mock import MagicMock, patch
+
+import pytest
+import stripe
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.credits import get_cached_credits
+from core.models import CreditedPayment, Profile, Transaction
+from core.payment import PaymentProcessor, purchase_cache_key, purchase_lock_key
+from core.tokens import CachedRefreshToken
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def user(db):
+    user = User.objects.create_user(username='credituser', password='testpass123', email='credit@test.com')
+    Profile.objects.filter(user=user).update(credits=5)
+    return user
+
+
+@pytest.mark.django_db
+class TestDeductCredits:
+    def test_deducts_and_records_transaction(self, api_client, user):
+        api_client.force_authenticate(user=user)
+        response = api_client.post(reverse('deduct_credits'), {'amount': 2})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['credits'] == 3
+        assert Profile.objects.get(user=user).credits == 3
+        assert Transaction.objects.filter(user=user, transaction_type='usage', credits=2).exists()
+
+    def test_insufficient_credits_leaves_balance_untouched(self, api_client, user):
+        api_client.force_authenticate(user=user)
+        response = api_client.post(reverse('deduct_credits'), {'amount': 6})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['credits'] == 5
+        assert Profile.objects.get(user=user).credits == 5
+        assert not Transaction.objects.filter(user=user).exists()
+
+    def test_cached_balance_follows_deduction(self, api_client, user):
+        api_client.force_authenticate(user=user)
+        assert api_client.get(reverse('get_credits')).data['credits'] == 5
+
+        api_client.post(reverse('deduct_credits'), {'amount': 2})
+
+        assert api_client.get(reverse('get_credits')).data['credits'] == 3
+
+    def test_rejects_non_positive_amount(self, api_client, user):
+        api_client.force_authenticate(user=user)
+        response = api_client.post(reverse('deduct_credits'), {'amount': -3})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert Profile.objects.get(user=user).credits == 5
+
+
+@pytest.mark.django_db
+class TestConfirmPurchase:
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        cache.clear()
+        yield
+        cache.clear()
+
+    @patch('core.views.PaymentProcessor.verify_payment')
+    def test_confirm_is_queued_and_credited(self, mock_verify, api_client, user):
+        mock_verify.return_value = {'amount': 999, 'credits': 10, 'user_id': str(user.id)}
+        api_client.force_authenticate(user=user)
+        response = api_client.post(reverse('confirm_purchase'), {'session_id': 'cs_test_1'})
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['status'] == 'pending'
+        assert response.data['status_url'] == reverse('purchase_status', args=['cs_test_1'])
+
+        poll = api_client.get(response.data['status_url'])
+        assert poll.data['status'] == 'completed'
+        assert poll.data['credits'] == 15
+        assert poll.data['added_credits'] == 10
+        assert Profile.objects.get(user=user).credits == 15
+        assert Transaction.objects.filter(stripe_payment_id='cs_test_1', status='completed').count() == 1
+
+    @patch('core.views.PaymentProcessor.verify_payment')
+    def test_credited_session_is_answered_from_cache(self, mock_verify, api_client, user):
+        cache.set(purchase_cache_key('cs_test_2'), {'user_id': user.id, 'credits': 10})
+        api_client.force_authenticate(user=user)
+        response = api_client.post(reverse('confirm_purchase'), {'session_id': 'cs_test_2'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['already_processed'] is True
+        assert response.data['added_credits'] == 10
+        mock_verify.assert_not_called()
+
+    @patch('core.views.PaymentProcessor.verify_payment')
+    def test_session_credited_to_another_user_is_not_reported(self, mock_verify, api_client, user):
+        mock_verify.return_value = {'amount': 999, 'credits': 10, 'user_id': str(user.id + 1)}
+        cache.set(purchase_cache_key('cs_theirs'), {'user_id': user.id + 1, 'credits': 10})
+        api_client.force_authenticate(user=user)
+        response = api_client.post(reverse('confirm_purchase'), {'session_id': 'cs_theirs'})
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert api_client.get(response.data['status_url']).data['status'] == 'failed'
+        # The owner's entry is untouched by the rejected confirm
+        assert cache.get(purchase_cache_key('cs_theirs')) == {'user_id': user.id + 1, 'credits': 10}
+
+    @patch('core.views.PaymentProcessor.verify_payment')
+    def test_unknown_session_reports_failure(self, mock_verify, api_client, user):
+        mock_verify.side_effect = stripe.error.InvalidRequestError('No such checkout.session', 'id')
+        api_client.force_authenticate(user=user)
+        response = api_client.post(reverse('confirm_purchase'), {'session_id': 'cs_missing'})
+
+        poll = api_client.get(response.data['status_url'])
+        assert poll.data == {'status': 'failed', 'error': 'Checkout session not found'}
+        assert Profile.objects.get(user=user).credits == 5
+
+    @patch('core.views.PaymentProcessor.verify_payment')
+    def test_session_bought_by_another_user_is_rejected(self, mock_verify, api_client, user):
+        mock_verify.return_value = {'amount': 999, 'credits': 10, 'user_id': str(user.id + 1)}
+        api_client.force_authenticate(user=user)
+        response = api_client.post(reverse('confirm_purchase'), {'session_id': 'cs_someone_else'})
+
+        poll = api_client.get(response.data['status_url'])
+        assert poll.data == {'status': 'failed', 'error': 'Checkout session not found'}
+        assert Profile.objects.get(user=user).credits == 5
+        assert not CreditedPayment.objects.filter(session_id='cs_someone_else').exists()
+
+    @patch('core.views.PaymentProcessor.verify_payment')
+    def test_confirm_in_progress_is_not_queued_again(self, mock_verify, api_client, user):
+        cache.add(purchase_lock_key(user.id, 'cs_test_3'), '1')
+        api_client.force_authenticate(user=user)
+        response = api_client.post(reverse('confirm_purchase'), {'session_id': 'cs_test_3'})
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        mock_verify.assert_not_called()
+        assert api_client.get(response.data['status_url']).data == {'status': 'pending'}
+
+    def test_batch_confirm_rejects_oversized_batch(self, api_client, user):
+        api_client.force_authenticate(user=user)
+        response = api_client.post(
+            reverse('confirm_purchases'),
+            {'session_ids': [f'cs_{i}' for i in range(21)]},
+            format='json'
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'session_ids' in response.data['details']
+
+    @patch('core.views.PaymentProcessor.verify_payment')
+    def test_batch_confirm_credits_in_one_update(self, mock_verify, api_client, user):
+        def verify(session_id):
+            if session_id == 'cs_unpaid':
+                return None
+            if session_id == 'cs_odd_amount':
+                raise ValueError("No credit package costs 1 cents")
+            owner = user.id + 1 if session_id == 'cs_other' else user.id
+            return {'amount': 999, 'credits': 10, 'user_id': str(owner)}
+
+        mock_verify.side_effect = verify
+        CreditedPayment.objects.create(session_id='cs_done', user=user, credits=10, claim_id=uuid.uuid4())
+        api_client.force_authenticate(user=user)
+        response = api_client.post(
+            reverse('confirm_purchases'),
+            {'session_ids': ['cs_a', 'cs_b', 'cs_done', 'cs_unpaid', 'cs_odd_amount', 'cs_other']},
+            format='json'
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['credits'] == 25
+        assert response.data['added_credits'] == 20
+        assert sorted(response.data['processed']) == ['cs_a', 'cs_b']
+        assert response.data['already_processed'] == ['cs_done']
+        assert response.data['failed'] == ['cs_unpaid', 'cs_odd_amount', 'cs_other']
+        assert mock_verify.call_count == 5
+
+
+@pytest.mark.django_db(transaction=True)
+@patch('core.views.PaymentProcessor.verify_payment')
+def test_cached_balance_follows_purchase(mock_verify, api_client, user):
+    cache.clear()
+    mock_verify.return_value = {'amount': 999, 'credits': 10, 'user_id': str(user.id)}
+    assert get_cached_credits(user.id) == 5
+    api_client.force_authenticate(user=user)
+
+    response = api_client.post(reverse('confirm_purchase'), {'session_id': 'cs_test_cached'})
+
+    assert api_client.get(response.data['status_url']).data['credits'] == 15
+    assert cache.get(Profile.credits_cache_key(user.id)) == 15
+
+
+@pytest.mark.django_db(transaction=True)
+@patch('core.views.PaymentProcessor.verify_payment')
+def test_cached_balance_follows_deduction(mock_verify, api_client, user):
+    cache.clear()
+    mock_verify.return_value = {'amount': 999, 'credits': 100, 'user_id': str(user.id)}
+    assert get_cached_credits(user.id) == 5
+    api_client.force_authenticate(user=user)
+
+    api_client.post(reverse('deduct_credits'), {'amount': 2})
+    response = api_client.post(reverse('confirm_purchase'), {'session_id': 'cs_test_deducted'})
+
+    assert api_client.get(response.data['status_url']).data['credits'] == 103
+    assert Profile.objects.get(user=user).credits == 103
+
+
+class TestVerifyPayment:
+    @pytest.fixture(autouse=True)
+    def setup(self, settings):
+        settings.STRIPE_SECRET_KEY = 'sk_test'
+        cache.clear()
+        yield
+        cache.clear()
+
+    @patch('core.payment.stripe.checkout.Session.retrieve')
+    def test_paid_session_is_cached(self, mock_retrieve):
+        mock_retrieve.return_value = {'payment_status': 'paid', 'amount_total': 999, 'metadata': {'user_id': '7'}}
+
+        expected = {'amount': 999, 'credits': 100, 'user_id': '7'}
+        assert PaymentProcessor.verify_payment('cs_paid') == expected
+        assert PaymentProcessor.verify_payment('cs_paid') == expected
+        mock_retrieve.assert_called_once()
+
+    @patch('core.payment.stripe.checkout.Session.retrieve')
+    def test_unpaid_session_is_not_cached(self, mock_retrieve):
+        mock_retrieve.return_value = {'payment_status': 'unpaid', 'amount_total': 999}
+
+        assert PaymentProcessor.verify_payment('cs_unpaid') is None
+        assert PaymentProcessor.verify_payment('cs_unpaid') is None
+        assert mock_retrieve.call_count == 2
+
+    @patch('core.payment.stripe.checkout.Session.retrieve')
+    def test_unknown_amount_is_rejected(self, mock_retrieve):
+        mock_retrieve.return_value = {'payment_status': 'paid', 'amount_total': 1, 'metadata': {'credits': '1000'}}
+
+        with pytest.raises(ValueError):
+            PaymentProcessor.verify_payment('cs_odd_amount')
+
+    @patch('core.payment.STRIPE_SESSION.get')
+    def test_raw_fetch_reads_session_json(self, mock_get, settings):
+        settings.STRIPE_RAW_SESSION_FETCH = True
+        mock_get.return_value = MagicMock(status_code=200, content=b'{"payment_status": "paid", "amount_total": 2499}')
+
+        assert PaymentProcessor.verify_payment('cs_raw') == {'amount': 2499, 'credits': 300, 'user_id': None}
+        assert mock_get.call_args.args[0].endswith('/checkout/sessions/cs_raw')
+
+    @patch('core.payment.STRIPE_SESSION.get')
+    def test_raw_fetch_maps_missing_session_to_stripe_error(self, mock_get, settings):
+        settings.STRIPE_RAW_SESSION_FETCH = True
+        mock_get.return_value = MagicMock(status_code=404, content=b'{"error": {"message": "No such session"}}')
+
+        with pytest.raises(stripe.error.InvalidRequestError):
+            PaymentProcessor.verify_payment('cs_missing_raw')
+
+
+@pytest.mark.django_db
+class TestTokenRefresh:
+    def test_invalid_refresh_token_is_unauthorized(self, api_client):
+        response = api_client.post(reverse('token_refresh'), {'refresh': 'not-a-token'})
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert 'not-a-token' not in str(response.data)
+
+    def test_refresh_skips_blacklist_query_once_cached(self, api_client, user, django_assert_num_queries):
+        cache.clear()
+        refresh = str(CachedRefreshToken.for_user(user))
+        api_client.post(reverse('token_refresh'), {'refresh': refresh})
+
+        with django_assert_num_queries(0):
+            response = api_client.post(reverse('token_refresh'), {'refresh': refresh})
+        assert response.status_code == status.HTTP_200_OK
+        assert 'access' in response.data
+
+    def test_refresh_burst_reuses_access_token(self, api_client, user):
+        cache.clear()
+        refresh = str(CachedRefreshToken.for_user(user))
+        first = api_client.post(reverse('token_refresh'), {'refresh': refresh})
+        second = api_client.post(reverse('token_refresh'), {'refresh': refresh})
+
+        assert first.data['access'] == second.data['access']
+
+    def test_logged_out_refresh_token_is_rejected(self, api_client, user):
+        cache.clear()
+        refresh = str(CachedRefreshToken.for_user(user))
+        api_client.force_authenticate(user=user)
+        api_client.post(reverse('logout'), {'refresh_token': refresh})
+
+        response = api_client.post(reverse('token_refresh'), {'refresh': refresh})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_refresh_token_blacklisted_elsewhere_is_rejected(self, api_client, user):
+        cache.clear()
+        token = CachedRefreshToken.for_user(user)
+        api_client.post(reverse('token_refresh'), {'refresh': str(token)})
+        outstanding = OutstandingToken.objects.get(jti=token['jti'])
+        BlacklistedToken.objects.create(token=outstanding)
+
+        response = api_client.post(reverse('token_refresh'), {'refresh': str(token)})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_refreshed_access_token_identifies_user(self, api_client, user):
+        refresh = str(CachedRefreshToken.for_user(user))
+        response = api_client.post(reverse('token_refresh'), {'refresh': refresh})
+
+        access = AccessToken(response.data['access'])
+        assert str(access['user_id']) == str(user.id)
+        assert access['token_type'] == 'access'
+
+
+@pytest.mark.django_db
+class TestStripeWebhook:
+    @pytest.fixture(autouse=True)
+    def setup(self, settings):
+        settings.STRIPE_WEBHOOK_SECRET = 'whsec_test'
+        cache.clear()
+        yield
+        cache.clear()
+
+    def _event(self, user, session_id='cs_hook_1', **session):
+        return {
+            'type': 'checkout.session.completed',
+            'data': {'object': {
+                'id': session_id,
+                'payment_status': 'paid',
+                'amount_total': 999,
+                'metadata': {'user_id': str(user.id), 'credits': '100'},
+                **session,
+            }},
+        }
+
+    def _post(self, api_client):
+        return api_client.post(reverse('stripe_webhook'), data='{}', content_type='application/json',
+                               HTTP_STRIPE_SIGNATURE='sig')
+
+    @patch('core.views.stripe.Webhook.construct_event')
+    def test_completed_session_credits_user_once(self, mock_construct, api_client, user):
+        mock_construct.return_value = self._event(user)
+
+        for _ in range(2):
+            response = api_client.post(reverse('stripe_webhook'), data='{}', content_type='application/json',
+                                       HTTP_STRIPE_SIGNATURE='sig')
+            assert response.status_code == status.HTTP_200_OK
+
+        assert Profile.objects.get(user=user).credits == 105
+        assert Transaction.objects.filter(stripe_payment_id='cs_hook_1').count() == 1
+        assert CreditedPayment.objects.get(session_id='cs_hook_1').credits == 100
+
+    @patch('core.views.stripe.Webhook.construct_event')
+    def test_package_is_credited_when_tax_is_added(self, mock_construct, api_client, user):
+        mock_construct.return_value = self._event(
+            user, amount_total=2749, amount_subtotal=2499,
+            metadata={'user_id': str(user.id), 'package_id': 'pro'}
+        )
+
+        assert self._post(api_client).status_code == status.HTTP_200_OK
+        assert Profile.objects.get(user=user).credits == 305
+
+    @patch('core.views.stripe.Webhook.construct_event')
+    def test_mismatched_amount_records_failed_purchase(self, mock_construct, api_client, user):
+        mock_construct.return_value = self._event(
+            user, amount_total=500, amount_subtotal=500,
+            metadata={'user_id': str(user.id), 'package_id': 'pro'}
+        )
+
+        assert self._post(api_client).status_code == status.HTTP_200_OK
+        assert Profile.objects.get(user=user).credits == 5
+        assert Transaction.objects.get(stripe_payment_id='cs_hook_1').status == 'failed'
+
+    @patch('core.views.stripe.Webhook.construct_event')
+    def test_invalid_signature_is_rejected(self, mock_construct, api_client, user):
+        mock_construct.side_effect = stripe.error.SignatureVerificationError('bad signature', 'sig')
+
+        response = api_client.post(reverse('stripe_webhook'), data='{}', content_type='application/json',
+                                   HTTP_STRIPE_SIGNATURE='sig')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert Profile.objects.get(user=user).credits == 5
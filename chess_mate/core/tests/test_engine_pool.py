@@ -0,0 +1,77 @@
+from unittest.mock import MagicMock, patch
+
+import chess.engine
+from django.test import SimpleTestCase
+
+from core.engine_pool import EnginePool
+from core.game_analyzer import GameAnalyzer
+
+
+class TestEnginePool(SimpleTestCase):
+    def setUp(self):
+        self.pool = EnginePool(stockfish_path="/mock/path/to/stockfish", size=2)
+
+    @patch('chess.engine.SimpleEngine.popen_uci')
+    def test_released_engine_is_reused(self, mock_popen):
+        """Test that a released engine is handed out again instead of spawning a new one."""
+        mock_popen.return_value = MagicMock()
+
+        engine = self.pool.acquire()
+        self.pool.release(engine)
+
+        self.assertIs(self.pool.acquire(), engine)
+        mock_popen.assert_called_once()
+
+    @patch('chess.engine.SimpleEngine.popen_uci')
+    def test_pool_size_is_bounded(self, mock_popen):
+        """Test that the pool never spawns more engines than its size."""
+        mock_popen.side_effect = lambda path: MagicMock()
+
+        self.pool.acquire()
+        self.pool.acquire()
+
+        with self.assertRaises(Exception):
+            self.pool.acquire(timeout=0.01)
+        self.assertEqual(mock_popen.call_count, 2)
+
+    @patch('chess.engine.SimpleEngine.popen_uci')
+    def test_dead_engine_is_replaced(self, mock_popen):
+        """Test that a terminated engine is discarded and its slot refilled."""
+        dead_engine = MagicMock()
+        dead_engine.ping.side_effect = chess.engine.EngineTerminatedError()
+        fresh_engine = MagicMock()
+        mock_popen.side_effect = [dead_engine, fresh_engine]
+
+        self.pool.release(self.pool.acquire())
+
+        self.assertIs(self.pool.acquire(), fresh_engine)
+        dead_engine.quit.assert_called_once()
+
+    @patch('chess.engine.SimpleEngine.popen_uci')
+    def test_pooled_analyzer_returns_engine_on_close(self, mock_popen):
+        """Test that closing a pooled GameAnalyzer releases the engine instead of quitting it."""
+        engine = MagicMock()
+        mock_popen.return_value = engine
+
+        with patch('core.game_analyzer.ENGINE_POOL', self.pool):
+            analyzer = GameAnalyzer(engine=self.pool.acquire())
+            analyzer.close_engine()
+
+        engine.quit.assert_not_called()
+        self.assertIs(self.pool.acquire(), engine)
+
+    @patch('chess.engine.SimpleEngine.popen_uci')
+    def test_engine_is_discarded_when_block_raises(self, mock_popen):
+        """Test that an engine borrowed with ``engine()`` is replaced if analysis fails mid-search."""
+        broken_engine = MagicMock()
+        fresh_engine = MagicMock()
+        mock_popen.side_effect = [broken_engine, fresh_engine]
+
+        with self.assertRaises(chess.engine.EngineError):
+            with self.pool.engine():
+                raise chess.engine.EngineError("search failed")
+
+        broken_engine.quit.assert_called_once()
+        with self.pool.engine() as engine:
+            self.assertIs(engine, fresh_engine)
+        self.assertIs(self.pool.acquire(), fresh_engine)
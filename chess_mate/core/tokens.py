@@ -0,0 +1,74 @@
+"""
+JWT token helpers for ChessMate application.
+"""
+
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_to_epoch
+
+# Refresh bursts within this window (seconds) get the same, already signed access token
+ACCESS_TOKEN_REUSE_SECONDS = 30
+
+
+def refresh_token_cache_key(jti: str) -> str:
+    """Cache key holding the blacklist state of a refresh token."""
+    return f"rt:{jti}"
+
+
+def access_token_cache_key(jti: str) -> str:
+    """Cache key holding the access token recently minted from a refresh token."""
+    return f"access_for:{jti}"
+
+
+class CachedRefreshToken(RefreshToken):
+    """
+    Refresh token whose blacklist lookup is remembered in the cache until the token expires.
+
+    The signature and expiry are still verified on every decode; only the BlacklistedToken
+    query is skipped for tokens already known to be valid.
+    """
+
+    def _remaining_lifetime(self) -> int:
+        return max(1, self.payload["exp"] - datetime_to_epoch(aware_utcnow()))
+
+    def check_blacklist(self) -> None:
+        key = refresh_token_cache_key(self.payload[api_settings.JTI_CLAIM])
+        state = cache.get(key)
+        if state == "ok":
+            return
+        if state == "revoked":
+            raise TokenError("Token is blacklisted")
+
+        super().check_blacklist()
+        cache.set(key, "ok", timeout=self._remaining_lifetime())
+
+    @property
+    def access_token(self) -> AccessToken:
+        """Build the access token from the user id claim alone instead of copying every refresh claim."""
+        access = AccessToken()
+        access.set_exp(from_time=self.current_time)
+        access[api_settings.USER_ID_CLAIM] = self.payload[api_settings.USER_ID_CLAIM]
+        return access
+
+    def issue_access_token(self) -> str:
+        """Return a signed access token, reusing the one minted for this refresh token moments ago."""
+        key = access_token_cache_key(self.payload[api_settings.JTI_CLAIM])
+        access_token = cache.get(key)
+        if access_token is None:
+            access_token = str(self.access_token)
+            cache.set(key, access_token, timeout=ACCESS_TOKEN_REUSE_SECONDS)
+        return access_token
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def mark_refresh_token_revoked(sender, instance, **kwargs):
+    """Record the revocation in the cache however the token was blacklisted (logout, admin, flush)."""
+    outstanding = instance.token
+    remaining = datetime_to_epoch(outstanding.expires_at) - datetime_to_epoch(aware_utcnow())
+    cache.delete(access_token_cache_key(outstanding.jti))
+    cache.set(refresh_token_cache_key(outstanding.jti), "revoked", timeout=max(1, remaining))
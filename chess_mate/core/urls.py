@@ -23,10 +23,12 @@ urlpatterns = [
     path('api/fetch-games/', views.fetch_games, name='fetch_games'),
     path("api/dashboard/", views.dashboard_view, name="dashboard"),
     path("api/games/", views.get_saved_games, name="get_saved_games"),
+    path("api/games/<int:game_id>/analysis/", views.get_game_analysis, name="get_game_analysis"),
 
     # Analysis endpoints
     path("api/game/<int:game_id>/analysis/", views.analyze_game, name="analyze_game"),
     path("api/games/batch-analyze/", views.batch_analyze, name="batch_analyze_games"),
+    path("api/analysis/jobs/<int:job_id>/", views.analysis_job_status, name="analysis_job_status"),
 
     # Feedback endpoints
     path('api/feedback/<int:game_id>/', views.game_feedback_view, name='game_feedback'),
@@ -37,6 +39,9 @@ urlpatterns = [
     path('api/credits/deduct/', views.deduct_credits, name='deduct_credits'),
     path('api/purchase-credits/', views.purchase_credits, name='purchase_credits'),
     path('api/confirm-purchase/', views.confirm_purchase, name='confirm_purchase'),
+    path('api/purchases/<str:session_id>/', views.purchase_status, name='purchase_status'),
+    path('api/confirm-purchases/', views.confirm_purchases, name='confirm_purchases'),
+    path('api/stripe/webhook/', views.stripe_webhook, name='stripe_webhook'),
 
     # Email verification endpoint
     path('verify-email/<str:uidb64>/<str:token>/', views.verify_email, name='verify_email'),
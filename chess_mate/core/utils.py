@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 import chess
 import chess.pgn
 import chess.engine
@@ -52,18 +54,8 @@ def generate_feedback(analysis, is_white):
     }
     return feedback
 
-def generate_feedback_without_ai(analysis_data, stats):
-    """
-    Generate structured feedback without using AI.
-    
-    Args:
-        analysis_data (dict): Analysis data from the game
-        stats (dict): Statistics about the game
-        
-    Returns:
-        str: Formatted feedback string
-    """
-    template = """
+# Built once at import; filled in by _format_feedback_without_ai
+FEEDBACK_TEMPLATE = """
 Opening Analysis:
 • Based on your opening moves, {opening_feedback}
 • Key suggestion: {opening_suggestion}
@@ -84,9 +76,31 @@ Endgame Technique:
 • Your endgame play {endgame_feedback}
 • Practice suggestion: {endgame_suggestion}
 """
+
+def generate_feedback_without_ai(analysis_data, stats):
+    """
+    Generate structured feedback without using AI.
     
+    Args:
+        analysis_data (dict): Analysis data from the game
+        stats (dict): Statistics about the game
+        
+    Returns:
+        str: Formatted feedback string
+    """
+    common_mistakes = stats["common_mistakes"]
+    return _format_feedback_without_ai(
+        mistakes=common_mistakes.get("mistakes", 0),
+        blunders=common_mistakes.get("blunders", 0),
+        time_pressure=common_mistakes.get("time_pressure", 0),
+        average_accuracy=stats.get("average_accuracy", 0),
+    )
+
+@lru_cache(maxsize=1024)
+def _format_feedback_without_ai(mistakes, blunders, time_pressure, average_accuracy):
+    """Render the standard feedback template; memoized since it only depends on these four stats."""
     # Opening feedback
-    if stats["common_mistakes"].get("mistakes", 0) > 1:
+    if mistakes > 1:
         opening_feedback = "you might benefit from deeper opening preparation"
         opening_suggestion = "study the main lines of your chosen openings"
     else:
@@ -94,7 +108,7 @@ Endgame Technique:
         opening_suggestion = "consider expanding your opening repertoire"
 
     # Middlegame feedback
-    if stats.get("average_accuracy", 0) < 70:
+    if average_accuracy < 70:
         middlegame_feedback = "room for improvement in positional understanding"
         middlegame_areas = "piece coordination and pawn structure management"
     else:
@@ -102,7 +116,6 @@ Endgame Technique:
         middlegame_areas = "complex position evaluation and long-term planning"
 
     # Tactical feedback
-    blunders = stats["common_mistakes"].get("blunders", 0)
     if blunders > 0.5:
         tactical_feedback = f"an average of {blunders:.1f} blunders per game"
         tactical_suggestion = "practice tactical puzzles daily"
@@ -111,7 +124,6 @@ Endgame Technique:
         tactical_suggestion = "work on finding more advanced tactical opportunities"
 
     # Time management
-    time_pressure = stats["common_mistakes"].get("time_pressure", 0)
     if time_pressure > 0.3:
         time_feedback = "you often get into time trouble"
         time_suggestion = "practice better time allocation in the opening and middlegame"
@@ -120,14 +132,14 @@ Endgame Technique:
         time_suggestion = "fine-tune your time usage in critical positions"
 
     # Endgame feedback
-    if stats.get("average_accuracy", 0) > 80:
+    if average_accuracy > 80:
         endgame_feedback = "shows strong technical understanding"
         endgame_suggestion = "study more complex endgame positions"
     else:
         endgame_feedback = "could benefit from more practice"
         endgame_suggestion = "focus on basic endgame principles and common patterns"
 
-    return template.format(
+    return FEEDBACK_TEMPLATE.format(
         opening_feedback=opening_feedback,
         opening_suggestion=opening_suggestion,
         middlegame_feedback=middlegame_feedback,
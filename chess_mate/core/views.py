@@ -5,81 +5,86 @@ analyzing, and providing feedback on chess games, as well as user authentication
 
 # Standard library imports
 import os
-import json
 import logging
+import re
 import httpx
 import uuid
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from django.utils import timezone
 from typing import Dict, Any, List, Optional
 
 # Django imports
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.core.mail import send_mail
-from django.db import transaction
+from django.db import transaction, IntegrityError
 from django_ratelimit.decorators import ratelimit   # type: ignore
 from django.db import models
+from django.db.models import Count, F, Max, Q, Window
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.utils.http import parse_etags, urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.template.loader import render_to_string
 from django.contrib.sites.shortcuts import get_current_site
 from django.urls import reverse
+from django.core.cache import cache
 
 # Third-party imports
 import requests
+import stripe
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
-import chess.engine
-from openai import OpenAI
+from rest_framework_simplejwt.exceptions import TokenError
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.html import strip_tags
 
 # Local application imports
-from .models import Game, GameAnalysis, Profile, Transaction
-from .chess_services import ChessComService, LichessService, save_game
+from .models import Game, Profile, Transaction, AnalysisJob, CreditedPayment, login_email_cache_key
 from .game_analyzer import GameAnalyzer
 from .validators import validate_password_complexity
-from .ai_feedback import AIFeedbackGenerator
+from .tokens import CachedRefreshToken
+from .renderers import ORJSONRenderer
+from .pagination import GamePagination
+from .credits import expire_cached_credits, get_cached_credits
+from .serializers import ConfirmPurchaseSerializer, ConfirmPurchasesSerializer, RefreshTokenSerializer
+from .ai_feedback import get_feedback_generator
 from .decorators import rate_limit
-from .payment import PaymentProcessor, CREDIT_PACKAGES
+from .payment import (
+    PaymentProcessor, PaymentServiceUnavailable, PURCHASE_LOCK_TIMEOUT, get_package, credit_purchases,
+    credits_for_session, get_cached_purchase_credits, is_session_owner, purchase_error_key, purchase_lock_key
+)
 from .utils import generate_feedback_without_ai
+from .tasks import (
+    analysis_progress_key, analyze_game_task, batch_analyze_task, dynamic_feedback_task, fetch_games_task,
+    send_verification_email_task, credit_purchase_task, confirm_purchase_task, record_transaction_task
+)
 
 STOCKFISH_PATH = os.getenv("STOCKFISH_PATH")
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Initialize stripe
-try:
-    import stripe
-    stripe.api_key = settings.STRIPE_SECRET_KEY
-except ImportError:
-    stripe = None
-    logger.warning("Stripe package not installed. Payment features will be disabled.")
-
-def get_openai_client():
-    """Get OpenAI client with proper error handling."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        logger.warning("OpenAI API key not set. AI features will be disabled.")
-        return None
-    return OpenAI(api_key=api_key)
-
 # Initialize Stripe
-stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+stripe.api_key = settings.STRIPE_SECRET_KEY
+
+# Maximum number of concurrent OpenAI requests per batch feedback call
+AI_FEEDBACK_WORKERS = 8
+# Games summarised per OpenAI request in batch feedback
+AI_FEEDBACK_BATCH_SIZE = 8
+# How long a login email's user id (or its absence) is remembered
+LOGIN_EMAIL_CACHE_TIMEOUT = 600
+# Cached in place of a user id for emails that have no account
+UNKNOWN_LOGIN_EMAIL = 0
 
-# Initialize feedback generator with proper error handling
-ai_feedback_generator = AIFeedbackGenerator(api_key=os.getenv("OPENAI_API_KEY"))
 
 def index(request):
     """
@@ -87,6 +92,21 @@ def index(request):
     """
     return render(request, "index.html")
 
+def stream_json_list(rows, key=None, chunk_size=500):
+    """
+    Stream a queryset of dicts as a JSON array (optionally wrapped as {key: [...]}) without
+    materialising the full payload. Rows are read through a server-side cursor.
+    """
+    encoder = DjangoJSONEncoder()
+
+    def generate():
+        yield '{"%s": [' % key if key else '['
+        for i, row in enumerate(rows.iterator(chunk_size=chunk_size)):
+            yield (',' if i else '') + encoder.encode(row)
+        yield ']}' if key else ']'
+
+    return StreamingHttpResponse(generate(), content_type='application/json')
+
 @csrf_exempt
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
@@ -95,19 +115,42 @@ def get_saved_games(request):
     Retrieve saved games for the logged-in user.
     """
     user = request.user
-    games = Game.objects.filter(user=user).values(
-        "id",
-        "platform",
-        "white",
-        "black",
-        "opponent",
-        "result",
-        "date_played",
-        "opening_name",
-        "analysis"
-    ).order_by("-date_played")
-    
-    return Response(list(games), status=status.HTTP_200_OK)
+    games = Game.objects.filter(user=user)
+
+    # Any import, deletion or re-analysis changes the row count or the latest updated_at, so one
+    # aggregate query is enough to answer a revalidation without building the listing
+    state = games.aggregate(count=Count("id"), last_updated=Max("updated_at"))
+    last_updated = int(state["last_updated"].timestamp() * 1_000_000) if state["last_updated"] else 0
+    etag = f'"{user.id}-{state["count"]}-{last_updated}"'
+    if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+        response = HttpResponse(status=304)
+    else:
+        response = stream_json_list(games.values(
+            "id",
+            "platform",
+            "white",
+            "black",
+            "opponent",
+            "result",
+            "date_played",
+            "opening_name",
+            has_analysis=Q(analysis__isnull=False)
+        ).order_by("-date_played"))
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_game_analysis(request, game_id):
+    """
+    Return the stored analysis of one game; the listing only says whether it exists.
+    """
+    try:
+        analysis = Game.objects.values_list("analysis", flat=True).get(id=game_id, user=request.user)
+    except Game.DoesNotExist:
+        return Response({"error": "Game not found or unauthorized access."}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"analysis": analysis}, status=status.HTTP_200_OK)
 
 class EmailVerificationToken:
     @staticmethod
@@ -140,8 +183,12 @@ def register_view(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Check for existing email
-    if User.objects.filter(email=email).exists():
+    # Check for existing email and username in one query
+    existing = list(
+        User.objects.filter(Q(email=email) | Q(username=username)).values_list("email", "username")
+    )
+
+    if any(existing_email == email for existing_email, _ in existing):
         return Response(
             {
                 "error": "This email is already registered. Please use a different email or try logging in.",
@@ -150,8 +197,7 @@ def register_view(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Check for existing username
-    if User.objects.filter(username=username).exists():
+    if any(existing_username == username for _, existing_username in existing):
         return Response(
             {
                 "error": "This username is already taken. Please choose a different username.",
@@ -182,21 +228,16 @@ def register_view(request):
             Profile.objects.filter(user=user).delete()
             
             # Create new profile with starter credits
-            profile = Profile.objects.create(
+            Profile.objects.create(
                 user=user,
                 email_verification_token=EmailVerificationToken.generate_token(),
                 email_verification_sent_at=timezone.now(),
                 credits=10  # Give starter credits
             )
             
-            # Send verification email
-            try:
-                send_verification_email(request, user, profile.email_verification_token)
-            except Exception as e:
-                logger.error(f"Error sending verification email: {str(e)}")
-                # Don't fail registration if email fails, but log it
-                pass
-            
+            # Send verification email in the background after the user row is committed
+            send_verification_email(request, user)
+
         return Response(
             {
                 "message": "Registration successful! Please check your email to verify your account.",
@@ -204,59 +245,29 @@ def register_view(request):
             },
             status=status.HTTP_201_CREATED
         )
+    except IntegrityError:
+        # Lost a race with a concurrent signup for the same username
+        return Response(
+            {
+                "error": "This username is already taken. Please choose a different username.",
+                "field": "username"
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
     except Exception as e:
-        logger.error(f"Registration error: {str(e)}")
+        logger.error("Registration error: %s", e)
         return Response(
             {"error": "An unexpected error occurred during registration. Please try again."},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
-def send_verification_email(request, user, token):
+def send_verification_email(request, user):
     """
-    Send verification email with activation link.
+    Queue the verification email once the new user has been committed.
     """
-    try:
-        current_site = get_current_site(request)
-        protocol = 'https' if request.is_secure() else 'http'
-        verification_url = f"{protocol}://{current_site.domain}/verify-email/{urlsafe_base64_encode(force_bytes(user.pk))}/{token}"
-        
-        subject = "Verify Your Email - ChessMate"
-        html_message = render_to_string('email/verify_email.html', {
-            'user': user,
-            'verification_url': verification_url,
-            'domain': current_site.domain,
-        })
-        
-        # Create plain text version
-        text_message = f"""
-        Hello {user.username},
-        
-        Thank you for registering with ChessMate. To complete your registration and activate your account, please visit:
-        
-        {verification_url}
-        
-        This verification link will expire in 7 days.
-        
-        If you did not create an account with ChessMate, please ignore this email.
-        """
-        
-        logger.info(f"Attempting to send verification email to {user.email}")
-        
-        send_mail(
-            subject=subject,
-            message=text_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False,
-            html_message=html_message
-        )
-        
-        logger.info(f"Successfully sent verification email to {user.email}")
-        
-    except Exception as e:
-        logger.error(f"Failed to send verification email to {user.email}. Error: {str(e)}")
-        logger.error(f"Email settings: HOST={settings.EMAIL_HOST}, PORT={settings.EMAIL_PORT}, USER={settings.EMAIL_HOST_USER}, FROM={settings.DEFAULT_FROM_EMAIL}")
-        raise
+    domain = get_current_site(request).domain
+    protocol = 'https' if request.is_secure() else 'http'
+    transaction.on_commit(lambda: send_verification_email_task.delay(user.id, domain, protocol))
 
 @csrf_exempt
 @api_view(["GET"])
@@ -295,11 +306,35 @@ def verify_email(request, uidb64, token):
         }, status=400)
         
     except (TypeError, ValueError, OverflowError, User.DoesNotExist, Profile.DoesNotExist) as e:
-        logger.error(f"Email verification error: {str(e)}")
+        logger.error("Email verification error: %s", e)
         return render(request, 'verification_error.html', {
             'error': 'Invalid verification link.'
         }, status=400)
 
+def get_user_by_login_email(email):
+    """
+    Return the user with the given login email, or None, remembering the answer in the cache.
+
+    auth_user.email is not indexed, so a cached id turns repeat logins into a primary key lookup
+    and a cached miss answers repeated attempts with unknown emails without a table scan.
+    """
+    key = login_email_cache_key(email)
+    user_id = cache.get(key)
+    if user_id == UNKNOWN_LOGIN_EMAIL:
+        return None
+    if user_id is not None:
+        # The email may have changed since the id was cached
+        user = User.objects.filter(id=user_id, email=email).first()
+        if user is not None:
+            return user
+
+    try:
+        user = User.objects.get(email=email)
+    except User.DoesNotExist:
+        user = None
+    cache.set(key, user.id if user else UNKNOWN_LOGIN_EMAIL, timeout=LOGIN_EMAIL_CACHE_TIMEOUT)
+    return user
+
 @rate_limit(endpoint_type='AUTH')
 @api_view(['POST'])
 def login_view(request):
@@ -317,9 +352,8 @@ def login_view(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
+        user = get_user_by_login_email(email)
+        if user is None:
             return Response(
                 {"error": "Invalid email or password."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -348,7 +382,7 @@ def login_view(request):
             }
         }, status=status.HTTP_200_OK)
     except Exception as e:
-        logger.error(f"Login error: {str(e)}")
+        logger.error("Login error: %s", e)
         return Response(
             {"error": "An error occurred during login."},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -381,131 +415,41 @@ def fetch_games(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    try:
-        with transaction.atomic():
-            profile = Profile.objects.select_for_update().get(user=user)
-            required_credits = num_games
-            
-            if profile.credits < required_credits:
-                return Response(
-                    {"error": f"Not enough credits. Required: {required_credits}, Available: {profile.credits}"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            try:
-                if platform == "chess.com":
-                    games = ChessComService.fetch_games(username, game_mode, limit=num_games)
-                elif platform == "lichess":
-                    games = LichessService.fetch_games(username, game_mode, limit=num_games)
-                else:
-                    return Response(
-                        {"error": "Invalid platform. Use 'chess.com' or 'lichess'."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                if not games:
-                    return Response(
-                        {"message": "No games found for the given username and criteria."},
-                        status=status.HTTP_200_OK
-                    )
-                
-                logger.info(f"Fetched {len(games)} games from {platform} for user {username}")
-            except Exception as e:
-                logger.error(f"Error fetching games from {platform}: {str(e)}")
-                return Response(
-                    {"error": f"Failed to fetch games from {platform}. Please try again later."},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+    if platform not in ("chess.com", "lichess"):
+        return Response(
+            {"error": "Invalid platform. Use 'chess.com' or 'lichess'."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-            saved_games = []
-            saved_count = 0
-            for game_data in games:
-                try:
-                    # Ensure game_id exists and is unique
-                    game_id = game_data.get("game_id")
-                    if not game_id:
-                        logger.warning(f"Skipping game without game_id: {game_data}")
-                        continue
-                        
-                    # Check if game already exists
-                    if Game.objects.filter(user=user, platform=platform, game_id=game_id).exists():
-                        logger.info(f"Game {game_id} already exists for user {user.username}")
-                        continue
-
-                    game = Game.objects.create(
-                        user=user,
-                        platform=platform,
-                        game_id=game_id,
-                        pgn=game_data.get("pgn", ""),
-                        result=game_data.get("result", "unknown"),
-                        white=game_data.get("white", ""),
-                        black=game_data.get("black", ""),
-                        opponent=game_data.get("opponent", "Unknown"),
-                        opening_name=game_data.get("opening_name", "Unknown Opening"),
-                        date_played=game_data.get("played_at") or datetime.now()
-                    )
-                    saved_count += 1
-                    saved_games.append({
-                        "id": game.id,
-                        "platform": game.platform,
-                        "white": game.white,
-                        "black": game.black,
-                        "opponent": game.opponent,
-                        "result": game.result,
-                        "date_played": game.date_played,
-                        "opening_name": game.opening_name,
-                        "game_id": game.game_id
-                    })
-                    
-                    if saved_count >= num_games:
-                        break
-                except Exception as e:
-                    logger.error(f"Error saving game: {str(e)}")
-                    continue
-
-            if saved_count > 0:
-                profile.credits -= saved_count
-                profile.save()
-
-                Transaction.objects.create(
-                    user=user,
-                    transaction_type='usage',
-                    credits=saved_count,
-                    status='completed'
-                )
+    try:
+        profile = user.profile
+        if profile.credits < num_games:
+            return Response(
+                {"error": f"Not enough credits. Required: {num_games}, Available: {profile.credits}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-                logger.info(f"Successfully saved {saved_count} games for user {user.username}")
-                return Response(
-                    {
-                        "message": f"Successfully fetched and saved {saved_count} games!",
-                        "games_saved": saved_count,
-                        "credits_deducted": saved_count,
-                        "credits_remaining": profile.credits,
-                        "games": saved_games
-                    },
-                    status=status.HTTP_201_CREATED
-                )
-            else:
-                logger.warning(f"No new games were saved for user {user.username}")
-                return Response(
-                    {
-                        "message": "No new games were saved. They might already exist in your account.",
-                        "games_saved": 0,
-                        "credits_deducted": 0,
-                        "credits_remaining": profile.credits,
-                        "games": []
-                    },
-                    status=status.HTTP_200_OK
-                )
+        # Import the games in the background; the client polls the job for the result
+        job = AnalysisJob.objects.create(user=user, job_type='fetch_games')
+        fetch_games_task.delay(job.id, user.id, platform, username, game_mode, num_games)
 
+        return Response(
+            {
+                "message": "Game import queued.",
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": reverse("analysis_job_status", args=[job.id])
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
     except Profile.DoesNotExist:
-        logger.error(f"Profile not found for user {user.username}")
+        logger.error("Profile not found for user %s", user.username)
         return Response(
             {"error": "User profile not found."},
             status=status.HTTP_404_NOT_FOUND
         )
     except Exception as e:
-        logger.error(f"Error in fetch_games: {str(e)}")
+        logger.error("Error in fetch_games: %s", str(e))
         return Response(
             {"error": "Failed to fetch games. Please try again later."},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -513,6 +457,7 @@ def fetch_games(request):
 
 @csrf_exempt
 @api_view(["GET"])
+@renderer_classes([ORJSONRenderer])
 @permission_classes([IsAuthenticated])
 def user_games_view(request):
     """
@@ -528,24 +473,22 @@ def user_games_view(request):
     if platform != 'all':
         games = games.filter(platform=platform)
     
-    games = games.order_by("-date_played")
-    
-    games_data = [
-        {
-            "id": game.id,
-            "white": game.white,
-            "black": game.black,
-            "result": game.result,
-            "date_played": game.date_played,
-            "platform": game.platform,
-            "analysis": game.analysis
-        }
-        for game in games
-    ]
-    return Response({"games": games_data}, status=status.HTTP_200_OK)
+    games = games.order_by("-date_played").values(
+        "id",
+        "white",
+        "black",
+        "result",
+        "date_played",
+        "platform",
+        has_analysis=Q(analysis__isnull=False)
+    )
+    paginator = GamePagination()
+    page = paginator.paginate_queryset(games, request)
+    return paginator.get_paginated_response(page)
 
 @rate_limit(endpoint_type='ANALYSIS')
 @api_view(['POST'])
+@renderer_classes([ORJSONRenderer])
 @permission_classes([IsAuthenticated])
 def analyze_game(request, game_id):
     """
@@ -558,11 +501,12 @@ def analyze_game(request, game_id):
 
         # Fetch the game from the database
         try:
-            game = Game.objects.get(id=game_id, user=user)
+            # The view only needs the stored results; the PGN is read by the worker
+            game = Game.objects.only("id", "analysis", "feedback").get(id=game_id, user=user)
             
             # Check if game already has analysis and feedback
             if game.analysis:
-                logger.info(f"Returning existing analysis for game {game_id}")
+                logger.info("Returning existing analysis for game %s", game_id)
                 return Response({
                     "message": "Analysis retrieved from cache",
                     "analysis": game.analysis,
@@ -583,115 +527,50 @@ def analyze_game(request, game_id):
         except Profile.DoesNotExist:
             return Response({"error": "User profile not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Initialize GameAnalyzer
-        analyzer = GameAnalyzer()
-        analysis_results = {}
+        # Run the engine in the background; the client polls the job for the result
+        job = AnalysisJob.objects.create(user=user, game=game, job_type='analysis')
+        analyze_game_task.delay(job.id, game.id, user.id, depth, use_ai)
 
-        try:
-            logger.info("Analyzing game %s", game_id)
-            start_time = datetime.utcnow()
-            
-            # Analyze the game
-            analysis_results = analyzer.analyze_games([game], depth=depth)
-            
-            analysis_time = (datetime.utcnow() - start_time).total_seconds()
-            logger.info("Analysis completed in %.2f seconds", analysis_time)
-            
-            if not analysis_results or game_id not in analysis_results:
-                return Response({"error": "Analysis failed to produce results."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            # Generate comprehensive feedback
-            feedback = analyzer.generate_feedback(analysis_results[game_id])
-            
-            # Try AI feedback if requested
-            if use_ai:
-                try:
-                    profile, _ = Profile.objects.get_or_create(
-                        user=user,
-                        defaults={
-                            'rating': 1500,
-                            'total_games': 0,
-                            'preferred_openings': []
-                        }
-                    )
-                    
-                    # Generate AI feedback using the feedback generator
-                    ai_feedback = ai_feedback_generator.generate_personalized_feedback(
-                        game_analysis=analysis_results[game_id],
-                        player_profile={
-                            "username": user.username,
-                            "rating": profile.rating,
-                            "total_games": profile.total_games,
-                            "preferred_openings": profile.preferred_openings
-                        }
-                    )
-                    feedback["ai_suggestions"] = ai_feedback
-                except Exception as e:
-                    logger.warning("AI feedback generation failed, falling back to standard analysis: %s", str(e))
-                    feedback["ai_suggestions"] = generate_feedback_without_ai(
-                        analysis_results[game_id],
-                        {
-                            "average_accuracy": feedback.get("opening", {}).get("accuracy", 0),
-                            "common_mistakes": {
-                                "blunders": feedback.get("blunders", 0),
-                                "mistakes": feedback.get("mistakes", 0),
-                                "inaccuracies": feedback.get("inaccuracies", 0),
-                                "time_pressure": len(feedback.get("time_management", {}).get("time_pressure_moves", []))
-                            }
-                        }
-                    )
-            else:
-                feedback["ai_suggestions"] = generate_feedback_without_ai(
-                    analysis_results[game_id],
-                    {
-                        "average_accuracy": feedback.get("opening", {}).get("accuracy", 0),
-                        "common_mistakes": {
-                            "blunders": feedback.get("blunders", 0),
-                            "mistakes": feedback.get("mistakes", 0),
-                            "inaccuracies": feedback.get("inaccuracies", 0),
-                            "time_pressure": len(feedback.get("time_management", {}).get("time_pressure_moves", []))
-                        }
-                    }
-                )
-
-            # Update game with analysis results and feedback
-            game.analysis = analysis_results[game_id]
-            game.feedback = feedback  # Save feedback for future use
-            game.save()
-
-            # Deduct credits
-            profile.credits -= 1
-            profile.save()
-
-            # Create transaction record
-            Transaction.objects.create(
-                user=user,
-                transaction_type='analysis',
-                credits=1,
-                status='completed'
-            )
-            
-            return Response({
-                "message": "Analysis completed successfully!",
-                "analysis": analysis_results[game_id],
-                "feedback": feedback,
-                "credits_remaining": profile.credits
-            }, status=status.HTTP_200_OK)
-        finally:
-            try:
-                analyzer.close_engine()
-            except Exception as e:
-                logger.error("Error closing engine: %s", str(e))
+        return Response({
+            "message": "Analysis queued.",
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": reverse("analysis_job_status", args=[job.id])
+        }, status=status.HTTP_202_ACCEPTED)
     except Exception as e:
         logger.error("Error in analyze_game_view: %s", str(e), exc_info=True)
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def analysis_job_status(request, job_id):
+    """
+    Poll the status of a background analysis or game import job.
+    """
+    try:
+        job = AnalysisJob.objects.get(id=job_id, user=request.user)
+    except AnalysisJob.DoesNotExist:
+        return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response({
+        "job_id": job.id,
+        "job_type": job.job_type,
+        "game_id": job.game_id,
+        "status": job.status,
+        "result": job.result,
+        "error": job.error or None,
+        "progress": cache.get(analysis_progress_key(job.id)) if job.job_type == 'batch_analysis' else None,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at
+    }, status=status.HTTP_200_OK)
+
 @rate_limit(endpoint_type='ANALYSIS')
 @api_view(['POST'])
+@renderer_classes([ORJSONRenderer])
 @permission_classes([IsAuthenticated])
 def batch_analyze(request):
     """
-    Endpoint to analyze a batch of games.
+    Endpoint to queue analysis of a batch of games; the result is polled from the job status.
     """
     try:
         user = request.user
@@ -707,11 +586,8 @@ def batch_analyze(request):
         except (TypeError, ValueError):
             return Response({"error": "Invalid number of games value."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Fetch games for the user
-        games = Game.objects.filter(user=user).order_by("-date_played")[:num_games]
-        
         # Return empty results if no games found
-        if not games.exists():
+        if not Game.objects.filter(user=user).exists():
             return Response({
                 "message": "No games found for analysis.",
                 "results": {
@@ -734,234 +610,33 @@ def batch_analyze(request):
                 }
             }, status=status.HTTP_200_OK)
 
-        analyzer = GameAnalyzer()
-        try:
-            logger.info("Starting batch analysis for user %s with %d games.", user.id, len(games))
-            analysis_results = analyzer.analyze_games(games, depth=depth)
-
-            # Save analysis results to the database
-            for game in games:
-                if game.id in analysis_results:
-                    game.analysis = analysis_results[game.id]
-                    game.save()
-
-            # Generate comprehensive feedback for each game
-            feedback_results = {}
-            overall_stats = {
-                "total_games": len(games),
-                "wins": 0,
-                "losses": 0,
-                "draws": 0,
-                "average_accuracy": 0,
-                "common_mistakes": {
-                    "blunders": 0,
-                    "mistakes": 0,
-                    "inaccuracies": 0,
-                    "time_pressure": 0
-                },
-                "improvement_areas": [],
-                "strengths": []
-            }
-
-            total_accuracy = 0
-            for game in games:
-                if game.id in analysis_results:
-                    # Generate feedback for this game
-                    game_feedback = analyzer.generate_feedback(analysis_results[game.id])
-                    feedback_results[game.id] = game_feedback
-
-                    # Update overall stats
-                    if game.result == "win":
-                        overall_stats["wins"] += 1
-                    elif game.result == "loss":
-                        overall_stats["losses"] += 1
-                    else:
-                        overall_stats["draws"] += 1
-
-                    # Track mistakes and patterns
-                    overall_stats["common_mistakes"]["blunders"] += game_feedback["blunders"]
-                    overall_stats["common_mistakes"]["mistakes"] += game_feedback["mistakes"]
-                    overall_stats["common_mistakes"]["inaccuracies"] += game_feedback["inaccuracies"]
-                    
-                    # Calculate game accuracy
-                    total_moves = len(analysis_results[game.id])
-                    if total_moves > 0:
-                        good_moves = total_moves - (
-                            game_feedback["blunders"] + 
-                            game_feedback["mistakes"] + 
-                            game_feedback["inaccuracies"]
-                        )
-                        game_accuracy = (good_moves / total_moves) * 100
-                        total_accuracy += game_accuracy
-
-                        # Track time pressure
-                        if len(game_feedback["time_management"]["time_pressure_moves"]) > 3:
-                            overall_stats["common_mistakes"]["time_pressure"] += 1
-
-            # Calculate averages
-            num_analyzed_games = len(feedback_results)
-            if num_analyzed_games > 0:
-                # Calculate average accuracy based on good moves vs total moves
-                total_good_moves = 0
-                total_moves = 0
-                for game_feedback in feedback_results.values():
-                    moves = len(game_feedback.get("opening", {}).get("played_moves", []))
-                    mistakes = (
-                        game_feedback.get("blunders", 0) * 3 +  # Blunders count triple
-                        game_feedback.get("mistakes", 0) * 2 +  # Mistakes count double
-                        game_feedback.get("inaccuracies", 0)    # Inaccuracies count once
-                    )
-                    total_moves += moves
-                    total_good_moves += max(0, moves - mistakes)
-                
-                overall_stats["average_accuracy"] = (total_good_moves / total_moves * 100) if total_moves > 0 else 0
-                
-                # Normalize mistake counts
-                for mistake_type in overall_stats["common_mistakes"]:
-                    overall_stats["common_mistakes"][mistake_type] /= num_analyzed_games
-
-                # Generate improvement areas
-                if overall_stats["common_mistakes"]["blunders"] > 0.5:
-                    overall_stats["improvement_areas"].append({
-                        "area": "Tactical Awareness",
-                        "description": "Focus on reducing tactical oversights and blunders. Consider practicing tactical puzzles daily."
-                    })
-                if overall_stats["common_mistakes"]["mistakes"] > 1:
-                    overall_stats["improvement_areas"].append({
-                        "area": "Strategic Planning",
-                        "description": "Work on positional understanding and long-term planning. Study master games in your preferred openings."
-                    })
-                if overall_stats["common_mistakes"]["time_pressure"] > 0.3:
-                    overall_stats["improvement_areas"].append({
-                        "area": "Time Management",
-                        "description": "Improve time management, especially in critical positions. Practice playing games with increment."
-                    })
-
-                # Identify strengths
-                if overall_stats["average_accuracy"] > 70:
-                    overall_stats["strengths"].append({
-                        "area": "Overall Accuracy",
-                        "description": "Strong overall play with consistent move quality"
-                    })
-                if overall_stats["wins"] / num_analyzed_games > 0.5:
-                    overall_stats["strengths"].append({
-                        "area": "Competitive Performance",
-                        "description": "Good win rate showing strong competitive ability"
-                    })
-                if overall_stats["common_mistakes"]["blunders"] < 0.3:
-                    overall_stats["strengths"].append({
-                        "area": "Tactical Solidity",
-                        "description": "Strong tactical awareness with few major oversights"
-                    })
-                if overall_stats["common_mistakes"]["time_pressure"] < 0.2:
-                    overall_stats["strengths"].append({
-                        "area": "Time Management",
-                        "description": "Excellent time management across games"
-                    })
-
-            # Generate feedback (with or without AI)
-            if use_ai:
-                try:
-                    # Get or create user profile
-                    profile, created = Profile.objects.get_or_create(
-                        user=user,
-                        defaults={
-                            'rating': 1500,
-                            'total_games': 0,
-                            'preferred_openings': []
-                        }
-                    )
-                    
-                    # Generate AI feedback using the feedback generator
-                    ai_feedback = ai_feedback_generator.generate_personalized_feedback(
-                        game_analysis=analysis_results,
-                        player_profile={
-                            "username": user.username,
-                            "rating": profile.rating,
-                            "total_games": profile.total_games,
-                            "preferred_openings": profile.preferred_openings
-                        }
-                    )
-                    dynamic_feedback = ai_feedback
-                except Exception as e:
-                    logger.error("Error generating AI feedback: %s", str(e))
-                    # Fall back to non-AI feedback
-                    dynamic_feedback = generate_feedback_without_ai(analysis_results, overall_stats)
-                    overall_stats["ai_error"] = "AI feedback unavailable - using standard analysis"
-            else:
-                # Use non-AI feedback by default
-                dynamic_feedback = generate_feedback_without_ai(analysis_results, overall_stats)
-
-            response_data = {
-                "message": "Batch analysis completed!",
-                "results": {
-                    "individual_games": feedback_results,
-                    "overall_stats": overall_stats,
-                    "dynamic_feedback": dynamic_feedback
-                }
-            }
+        # Run the engines in the background; the client polls the job for progress and the result
+        job = AnalysisJob.objects.create(user=user, job_type='batch_analysis')
+        batch_analyze_task.delay(job.id, user.id, num_games, depth, use_ai)
 
-            return Response(response_data, status=200)
-        finally:
-            try:
-                analyzer.close_engine()
-            except chess.engine.EngineTerminatedError:
-                logger.warning("Engine already terminated.")
+        return Response({
+            "message": "Batch analysis queued.",
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": reverse("analysis_job_status", args=[job.id])
+        }, status=status.HTTP_202_ACCEPTED)
     except Exception as e:
         logger.error("Error in analyze_batch_games_view: %s", str(e), exc_info=True)
         return JsonResponse({"error": str(e)}, status=500)
 
-def generate_dynamic_feedback(results):
-    feedback = {
-        "timeManagement": {"avgTimePerMove": 0, "suggestion": ""},
-        "opening": {"playedMoves": [], "suggestion": ""},
-        "endgame": {"evaluation": "", "suggestion": ""},
-        "tacticalOpportunities": []
-    }
-
-    total_moves = 0
-    for game_analysis in results.values():
-        for move in game_analysis:
-            if move["is_capture"]:
-                feedback["tacticalOpportunities"].append(
-                    f"Tactical opportunity on move {move['move_number']}"
-                )
-            feedback["timeManagement"]["avgTimePerMove"] += move.get("time_spent", 0)
-            total_moves += 1
-            if move["move_number"] <= 5:
-                feedback["opening"]["playedMoves"].append(move["move"])
-
-    if total_moves > 0:
-        feedback["timeManagement"]["avgTimePerMove"] /= total_moves
-
-    # Generate refined suggestions via OpenAI
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a chess analysis expert providing specific, actionable feedback to help players improve their game."},
-                {"role": "user", "content": f"Provide actionable feedback for chess analysis: {json.dumps(feedback)}"}
-            ],
-            max_tokens=200,
-            temperature=0.7
-        )
-        dynamic_feedback = response.choices[0].message.content.strip()
-        feedback["dynamicFeedback"] = dynamic_feedback
-    except Exception as e:
-        logger.error("Error generating feedback with OpenAI: %s", e)
-
-    return feedback
+# "<Section> Suggestion: ..." lines in the dynamic feedback text, compiled once per known section
+SUGGESTION_PATTERNS = {
+    section: re.compile(rf"{re.escape(section)} Suggestion:(.*)")
+    for section in ("Opening", "Endgame", "TimeManagement", "Tactical")
+}
 
 def extract_suggestion(feedback_text, section):
     """
     Extract the suggestion for a specific section from the dynamic feedback text.
     """
-    try:
-        start_index = feedback_text.index(f"{section} Suggestion:") + len(f"{section} Suggestion:")
-        end_index = feedback_text.index("\n", start_index)
-        return feedback_text[start_index:end_index].strip()
-    except ValueError:
-        return "No suggestion available."
+    pattern = SUGGESTION_PATTERNS.get(section) or re.compile(rf"{re.escape(section)} Suggestion:(.*)")
+    match = pattern.search(feedback_text)
+    return match.group(1).strip() if match else "No suggestion available."
 
 @csrf_exempt
 @api_view(["POST"])
@@ -971,16 +646,23 @@ def game_feedback_view(request, game_id):
     Provide feedback for a specific game by its ID.
     """
     user = request.user
-    game = Game.objects.filter(id=game_id, player=user).first()
+    game = Game.objects.filter(id=game_id, user=user).only("id", "analysis").first()
     if not game:
         return JsonResponse({"error": "Game not found."}, status=404)
 
-    game_analysis = GameAnalysis.objects.filter(game=game)
-    if not game_analysis.exists():
+    if not game.analysis:
         return JsonResponse({"error": "Analysis not found for this game."}, status=404)
 
-    feedback = generate_dynamic_feedback({game.id: game_analysis})
-    return JsonResponse({"feedback": feedback}, status=200)
+    # The OpenAI round-trip runs in a worker; the client polls the job for the feedback
+    job = AnalysisJob.objects.create(user=user, game=game, job_type='feedback')
+    dynamic_feedback_task.delay(job.id, game.id)
+
+    return JsonResponse({
+        "message": "Feedback queued.",
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": reverse("analysis_job_status", args=[job.id])
+    }, status=202)
 
 @csrf_exempt
 @api_view(["POST"])
@@ -993,38 +675,58 @@ def batch_feedback_view(request):
     game_ids = request.data.get("game_ids", [])
     use_ai = request.data.get("use_ai", True)
 
-    games = Game.objects.filter(id__in=game_ids, player=user)
-    if not games.exists():
+    # Analyses live on the Game row, so a single query loads everything the loop needs
+    games = list(Game.objects.filter(id__in=game_ids, user=user).only(
+        "id", "analysis", "feedback", "analysis_hash"
+    ))
+    if not games:
         return Response({"error": "No valid games found."}, status=404)
 
-    analyzer = GameAnalyzer()
     batch_feedback = {}
+    stale_games = []
+    for game in games:
+        if not game.analysis:
+            continue
+        if game.has_fresh_feedback():
+            batch_feedback[game.id] = game.feedback
+        else:
+            stale_games.append(game)
+
+    if stale_games:
+        # Feedback is built from the stored analysis, so no engine is needed here
+        for game in stale_games:
+            game.feedback = GameAnalyzer.generate_feedback(game.analysis)
+
+        # Generate AI feedback if requested; the OpenAI calls are I/O bound, so run them side by side
+        if use_ai and os.getenv("OPENAI_API_KEY"):
+            profile = user.profile
+            player_profile = {
+                "username": user.username,
+                "rating": profile.rating,
+                "total_games": profile.total_games()
+            }
 
-    try:
-        for game in games:
-            game_analysis = GameAnalysis.objects.filter(game=game)
-            if game_analysis.exists():
-                feedback = analyzer.generate_feedback(game_analysis)
-                
-                # Generate AI feedback if requested
-                if use_ai and os.getenv("OPENAI_API_KEY"):
-                    try:
-                        ai_feedback = ai_feedback_generator.generate_personalized_feedback(
-                            game_analysis=game_analysis,
-                            player_profile={
-                                "username": user.username,
-                                "rating": getattr(user.profile, "rating", None),
-                                "total_games": getattr(user.profile, "total_games", 0),
-                                "preferred_openings": getattr(user.profile, "preferred_openings", [])
-                            }
-                        )
-                        feedback["ai_suggestions"] = ai_feedback
-                    except Exception as e:
-                        logger.error("Error generating AI feedback: %s", str(e))
-                
-                batch_feedback[game.id] = feedback
-    finally:
-        analyzer.close_engine()
+            def ai_feedback_for(chunk):
+                return get_feedback_generator().generate_batch_feedback(
+                    game_analyses={game.id: game.analysis for game in chunk},
+                    player_profile=player_profile
+                )
+
+            chunks = [
+                stale_games[i:i + AI_FEEDBACK_BATCH_SIZE]
+                for i in range(0, len(stale_games), AI_FEEDBACK_BATCH_SIZE)
+            ]
+            games_by_id = {game.id: game for game in stale_games}
+            with ThreadPoolExecutor(max_workers=min(AI_FEEDBACK_WORKERS, len(chunks))) as executor:
+                for feedback_by_game in executor.map(ai_feedback_for, chunks):
+                    for game_id, ai_feedback in feedback_by_game.items():
+                        games_by_id[game_id].feedback["ai_suggestions"] = ai_feedback
+
+        for game in stale_games:
+            game.analysis_hash = game.compute_analysis_hash()
+            batch_feedback[game.id] = game.feedback
+
+        Game.objects.bulk_update(stale_games, ["feedback", "analysis_hash"], batch_size=100)
 
     return Response({"batch_feedback": batch_feedback}, status=200)
 
@@ -1053,7 +755,7 @@ def logout_view(request):
         if not refresh_token:
             return Response({"error": "Refresh token is required."},
             status=status.HTTP_400_BAD_REQUEST)
-        token = RefreshToken(refresh_token)
+        token = CachedRefreshToken(refresh_token)
         token.blacklist()
         return Response({"message": "Logout successful!"},
                         status=status.HTTP_200_OK)
@@ -1076,6 +778,9 @@ def game_analysis_view(request, game_id):
     return JsonResponse({"game_id": game_id, "analysis": analysis})
 
 #================================== Dashboard ==================================
+# Window counts the dashboard reads from the first of its recent games
+DASHBOARD_COUNTERS = ('total', 'analyzed', 'wins', 'losses', 'draws')
+
 @csrf_exempt
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
@@ -1086,18 +791,16 @@ def dashboard_view(request):
     user = request.user
     games = Game.objects.filter(user=user)
     
-    # Calculate statistics
-    total_games = games.count()
-    analyzed_games = games.exclude(analysis__isnull=True).count()
-    unanalyzed_games = total_games - analyzed_games
-    
-    # Calculate win/loss/draw statistics
-    wins = games.filter(result__iexact='win').count()
-    losses = games.filter(result__iexact='loss').count()
-    draws = games.filter(result__iexact='draw').count()
-    
-    # Get recent games
-    recent_games = games.order_by('-date_played')[:5].values(
+    # One round trip: the window counts run over all of the user's games before the slice keeps
+    # the five most recent, so every returned row also carries the totals.
+    # Results are stored lowercase, so plain equality works and no LOWER() is applied per row
+    recent_games = list(games.annotate(
+        total=Window(Count('id')),
+        analyzed=Window(Count('id', filter=Q(analysis__isnull=False))),
+        wins=Window(Count('id', filter=Q(result='win'))),
+        losses=Window(Count('id', filter=Q(result='loss'))),
+        draws=Window(Count('id', filter=Q(result='draw')))
+    ).order_by('-date_played')[:5].values(
         'id',
         'platform',
         'white',
@@ -1106,8 +809,20 @@ def dashboard_view(request):
         'result',
         'date_played',
         'opening_name',
-        'analysis'
-    )
+        *DASHBOARD_COUNTERS,
+        has_analysis=Q(analysis__isnull=False)
+    ))
+    stats = {counter: recent_games[0][counter] if recent_games else 0 for counter in DASHBOARD_COUNTERS}
+    for game in recent_games:
+        for counter in DASHBOARD_COUNTERS:
+            del game[counter]
+
+    total_games = stats['total']
+    analyzed_games = stats['analyzed']
+    unanalyzed_games = total_games - analyzed_games
+    wins = stats['wins']
+    losses = stats['losses']
+    draws = stats['draws']
     
     response_data = {
         'total_games': total_games,
@@ -1119,29 +834,29 @@ def dashboard_view(request):
             'draws': draws,
             'win_rate': round((wins / total_games * 100) if total_games > 0 else 0, 2)
         },
-        'recent_games': list(recent_games)
+        'recent_games': recent_games
     }
     
     return Response(response_data, status=status.HTTP_200_OK)
 
 @csrf_exempt
 @api_view(["GET"])
+@renderer_classes([ORJSONRenderer])
 @permission_classes([IsAuthenticated])
 def all_games_view(request):
     """
     Fetch all available games (generic endpoint).
     """
-    games = Game.objects.all().order_by("-played_at")  # Fetch all games
-    games_data = [
-        {
-            "id": game.id,
-            "title": game.title,
-            "result": game.result,
-            "played_at": game.played_at,
-        }
-        for game in games
-    ]
-    return Response({"games": games_data}, status=status.HTTP_200_OK)
+    games = Game.objects.order_by("-date_played").values(
+        "id",
+        "white",
+        "black",
+        "result",
+        "date_played"
+    )
+    paginator = GamePagination()
+    page = paginator.paginate_queryset(games, request)
+    return paginator.get_paginated_response(page)
 
 @rate_limit(endpoint_type='CREDITS')
 @api_view(['GET'])
@@ -1149,15 +864,15 @@ def all_games_view(request):
 def get_credits(request):
     """Get the current user's credit balance."""
     try:
-        with transaction.atomic():
-            profile = Profile.objects.select_for_update().get(user=request.user)
-            logger.info(f"Retrieved credits for user {request.user.username}: {profile.credits}")
-            return Response({'credits': profile.credits})
+        # Served from the credit cache; every write path expires it
+        credits = get_cached_credits(request.user.id)
+        logger.info("Retrieved credits for user %s: %s", request.user.username, credits)
+        return Response({'credits': credits})
     except Profile.DoesNotExist:
-        logger.error(f"Profile not found for user {request.user.username}")
+        logger.error("Profile not found for user %s", request.user.username)
         return Response({'error': 'Profile not found'}, status=404)
     except Exception as e:
-        logger.error(f"Error getting credits for user {request.user.username}: {str(e)}")
+        logger.error("Error getting credits for user %s: %s", request.user.username, e)
         return Response({'error': str(e)}, status=500)
 
 @rate_limit(endpoint_type='CREDITS')
@@ -1166,179 +881,266 @@ def get_credits(request):
 def deduct_credits(request):
     """Deduct credits from the user's balance."""
     try:
-        with transaction.atomic():
-            amount = int(request.data.get('amount', 1))
-            profile = Profile.objects.select_for_update().get(user=request.user)
-            
-            logger.info(f"Attempting to deduct {amount} credits from user {request.user.username} (current balance: {profile.credits})")
-            
-            if profile.credits < amount:
-                logger.warning(f"Insufficient credits for user {request.user.username}: has {profile.credits}, needs {amount}")
-                return Response({
-                    'error': 'Insufficient credits',
-                    'credits': profile.credits
-                }, status=400)
-            
-            profile.credits -= amount
-            profile.save()
-            
-            # Record the transaction
-            Transaction.objects.create(
-                user=request.user,
-                transaction_type='usage',
-                amount=0,
-                credits=amount,
-                status='completed'
-            )
-            
-            logger.info(f"Successfully deducted {amount} credits. New balance: {profile.credits}")
-            return Response({'credits': profile.credits})
+        amount = int(request.data.get('amount', 1))
+        if amount <= 0:
+            raise ValueError("Amount must be positive")
+
+        logger.info("Attempting to deduct %s credits from user %s", amount, request.user.username)
+
+        # Check and deduct in a single conditional UPDATE so concurrent requests can't overdraw
+        updated = Profile.objects.filter(user=request.user, credits__gte=amount).update(
+            credits=F('credits') - amount,
+            updated_at=timezone.now()
+        )
+        if not updated:
+            credits = Profile.objects.values_list('credits', flat=True).get(user=request.user)
+            logger.warning("Insufficient credits for user %s: has %s, needs %s", request.user.username, credits, amount)
+            return Response({
+                'error': 'Insufficient credits',
+                'credits': credits
+            }, status=400)
+        expire_cached_credits(request.user.id)
+
+        # The usage record is an audit entry, so it is written by a worker off the request path
+        record_transaction_task.delay(request.user.id, 'usage', amount)
+
+        credits = Profile.objects.values_list('credits', flat=True).get(user=request.user)
+        logger.info("Successfully deducted %s credits. New balance: %s", amount, credits)
+        return Response({'credits': credits})
     except Profile.DoesNotExist:
-        logger.error(f"Profile not found for user {request.user.username}")
+        logger.error("Profile not found for user %s", request.user.username)
         return Response({'error': 'Profile not found'}, status=404)
     except ValueError:
-        logger.error(f"Invalid amount provided: {request.data.get('amount')}")
+        logger.error("Invalid amount provided: %s", request.data.get('amount'))
         return Response({'error': 'Invalid amount'}, status=400)
     except Exception as e:
-        logger.error(f"Error deducting credits: {str(e)}")
+        logger.error("Error deducting credits: %s", e)
         return Response({'error': str(e)}, status=500)
 
 @rate_limit(endpoint_type='CREDITS')
 @api_view(['POST'])
+@renderer_classes([ORJSONRenderer])
 @permission_classes([IsAuthenticated])
 def purchase_credits(request):
     """Create a checkout session for credit purchase."""
+    package_id = request.data.get('package_id')
+    logger.info("Attempting to create checkout session for package %s for user %s", package_id, request.user.username)
+
+    package = get_package(package_id)
+    if package is None:
+        logger.error("Invalid package ID: %s", package_id)
+        return Response({'error': f'Invalid package: {package_id}'}, status=400)
+
+    if not settings.STRIPE_SECRET_KEY:
+        logger.error("Stripe secret key not configured")
+        return Response({'error': 'Payment processing is not configured'}, status=500)
+
     try:
-        package_id = request.data.get('package_id')
-        logger.info(f"Attempting to create checkout session for package {package_id} for user {request.user.username}")
-        
-        if not package_id or package_id not in CREDIT_PACKAGES:
-            logger.error(f"Invalid package ID: {package_id}")
-            return Response({'error': f'Invalid package: {package_id}'}, status=400)
-        
-        if not settings.STRIPE_SECRET_KEY:
-            logger.error("Stripe secret key not configured")
-            return Response({'error': 'Payment processing is not configured'}, status=500)
-        
-        package = CREDIT_PACKAGES[package_id]
-        try:
-            checkout_session = PaymentProcessor.create_checkout_session(
-                user_id=request.user.id,
-                package_id=package_id,
-                amount=package['price'],
-                credits=package['credits']
-            )
-            
-            logger.info(f"Successfully created checkout session for user {request.user.username}")
-            return Response({
-                'success': True,
-                'checkout_url': checkout_session.url,
-                'session_id': checkout_session.id
-            })
-        except Exception as e:
-            logger.error(f"Error in PaymentProcessor: {str(e)}")
-            return Response({
-                'error': 'Error creating checkout session',
-                'details': str(e)
-            }, status=500)
-            
-    except Exception as e:
-        logger.error(f"Error creating checkout session: {str(e)}")
-        return Response({
-            'error': 'Error processing request',
-            'details': str(e)
-        }, status=500)
+        checkout_session = PaymentProcessor.create_checkout_session(
+            user_id=request.user.id,
+            package_id=package_id,
+            amount=package['price'],
+            credits=package['credits']
+        )
+    except PaymentServiceUnavailable:
+        logger.exception("Stripe unavailable while creating checkout session")
+        return Response({'error': 'Payment provider unavailable, please retry'}, status=503)
+    except stripe.error.StripeError:
+        logger.exception("Stripe rejected checkout session for user %s", request.user.username)
+        return Response({'error': 'Error creating checkout session'}, status=502)
+
+    logger.info("Successfully created checkout session for user %s", request.user.username)
+    # The session id reaches the client through the success URL, so only the redirect target is returned
+    return Response({
+        'success': True,
+        'checkout_url': checkout_session.url
+    })
 
 @rate_limit(endpoint_type='CREDITS')
 @api_view(['POST'])
+@renderer_classes([ORJSONRenderer])
 @permission_classes([IsAuthenticated])
 def confirm_purchase(request):
-    """Confirm a credit purchase and add credits to user's account."""
-    session_id = request.data.get('session_id')
-    logger.info(f"Confirming purchase for session {session_id} for user {request.user.username}")
-    
-    if not session_id:
+    """
+    Confirm a credit purchase.
+
+    Already credited sessions are answered immediately. Otherwise verification with Stripe is
+    queued and the client polls the returned status URL.
+    """
+    serializer = ConfirmPurchaseSerializer(data=request.data)
+    if not serializer.is_valid():
         return Response({'error': 'Session ID required'}, status=400)
-    
-    try:
-        # First check if this payment was already processed
-        existing_transaction = Transaction.objects.filter(
-            stripe_payment_id=session_id,
-            status='completed'
-        ).first()
-        
-        if existing_transaction:
-            logger.warning(f"Payment {session_id} was already processed")
-            profile = Profile.objects.get(user=request.user)
-            return Response({
-                'success': True,
-                'credits': profile.credits,
-                'added_credits': existing_transaction.credits,
-                'already_processed': True
-            })
+    session_id = serializer.validated_data['session_id']
+    logger.info("Confirming purchase for session %s for user %s", session_id, request.user.username)
 
-        # Then verify the payment outside the transaction
-        payment_data = PaymentProcessor.verify_payment(session_id)
-        if not payment_data:
-            logger.error(f"Invalid or expired session: {session_id}")
-            return Response({'error': 'Invalid or expired session'}, status=400)
+    # Credits are normally granted by the Stripe webhook; this is a cache read in the common case
+    credited = get_cached_purchase_credits(request.user.id, session_id)
+    if credited is not None:
+        return Response({
+            'success': True,
+            'status': 'completed',
+            'credits': get_cached_credits(request.user.id),
+            'added_credits': credited,
+            'already_processed': True
+        })
 
-        # Finally, update credits in a transaction
-        with transaction.atomic():
-            profile = Profile.objects.select_for_update(nowait=True).get(user=request.user)
-            old_credits = profile.credits
-            profile.credits += payment_data['credits']
-            profile.save()
-            
-            # Record the transaction
-            new_transaction = Transaction.objects.create(
-                user=request.user,
-                transaction_type='purchase',
-                amount=payment_data['amount'],
-                credits=payment_data['credits'],
-                status='completed',
-                stripe_payment_id=session_id
-            )
-            
-            logger.info(f"Purchase confirmed. Credits updated from {old_credits} to {profile.credits}")
-            return Response({
-                'success': True,
-                'credits': profile.credits,
-                'added_credits': payment_data['credits']
-            })
-            
+    # Only the first confirm for a session queues a verification; repeats just poll
+    if cache.add(purchase_lock_key(request.user.id, session_id), "1", timeout=PURCHASE_LOCK_TIMEOUT):
+        cache.delete(purchase_error_key(request.user.id, session_id))
+        confirm_purchase_task.delay(request.user.id, session_id)
+
+    return Response({
+        'status': 'pending',
+        'status_url': reverse('purchase_status', args=[session_id])
+    }, status=202)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def purchase_status(request, session_id):
+    """Poll the outcome of a queued purchase confirmation."""
+    credited = get_cached_purchase_credits(request.user.id, session_id)
+    if credited is None:
+        # Fall back to the database when the cache entry has been evicted
+        credited = CreditedPayment.objects.filter(
+            session_id=session_id, user=request.user
+        ).values_list('credits', flat=True).first()
+
+    if credited is not None:
+        return Response({
+            'status': 'completed',
+            'credits': get_cached_credits(request.user.id),
+            'added_credits': credited
+        })
+
+    error = cache.get(purchase_error_key(request.user.id, session_id))
+    if error is not None:
+        return Response({'status': 'failed', 'error': error})
+
+    return Response({'status': 'pending'})
+
+@rate_limit(endpoint_type='CREDITS')
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def confirm_purchases(request):
+    """Confirm several checkout sessions at once with parallel Stripe lookups and one credit update."""
+    serializer = ConfirmPurchasesSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({'error': 'Invalid session IDs', 'details': serializer.errors}, status=400)
+    session_ids = list(dict.fromkeys(serializer.validated_data['session_ids']))
+
+    # Sessions that were already credited never need a Stripe round-trip
+    credited = set(CreditedPayment.objects.filter(
+        session_id__in=session_ids, user=request.user
+    ).values_list('session_id', flat=True))
+    pending = [session_id for session_id in session_ids if session_id not in credited]
+
+    def verify(session_id):
+        # A bad session fails on its own; only an unreachable Stripe aborts the batch
+        try:
+            payment_data = PaymentProcessor.verify_payment(session_id)
+        except stripe.error.InvalidRequestError:
+            logger.warning("Unknown checkout session %s in batch confirm", session_id)
+            return session_id, None
+        except (KeyError, TypeError, ValueError):
+            logger.exception("Malformed payment data for session %s in batch confirm", session_id)
+            return session_id, None
+        if payment_data and not is_session_owner(payment_data, request.user.id):
+            logger.warning("User %s tried to confirm session %s bought by another user",
+                           request.user.username, session_id)
+            return session_id, None
+        return session_id, payment_data
+
+    try:
+        payments = {}
+        if pending:
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                payments = {session_id: data for session_id, data in executor.map(verify, pending) if data}
+
+        result = credit_purchases(request.user.id, payments)
+    except PaymentServiceUnavailable:
+        logger.exception("Stripe unavailable while confirming batch for %s", request.user.username)
+        return Response({'error': 'Payment provider unavailable, please retry'}, status=503)
+    except stripe.error.StripeError:
+        logger.exception("Stripe error while confirming batch for %s", request.user.username)
+        return Response({'error': 'Error verifying payment'}, status=502)
     except Profile.DoesNotExist:
-        logger.error(f"Profile not found for user {request.user.username}")
+        logger.exception("Profile not found for user %s", request.user.username)
         return Response({'error': 'Profile not found'}, status=404)
-    except transaction.TransactionManagementError as e:
-        logger.error(f"Transaction error: {str(e)}")
-        return Response({
-            'error': 'Transaction error',
-            'details': 'Please try again in a moment'
-        }, status=500)
-    except Exception as e:
-        logger.error(f"Error confirming purchase: {str(e)}")
-        return Response({
-            'error': 'Error processing purchase',
-            'details': str(e)
-        }, status=500)
+
+    return Response({
+        'success': True,
+        'credits': result['credits'],
+        'added_credits': result['added_credits'],
+        'processed': result['processed'],
+        'already_processed': sorted(credited.union(result['already_processed'])),
+        'failed': [session_id for session_id in pending if session_id not in payments]
+    })
+
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    """Receive Stripe events and queue credit grants for completed checkout sessions."""
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        logger.error("Stripe webhook secret not configured")
+        return HttpResponse(status=500)
+
+    try:
+        event = stripe.Webhook.construct_event(
+            request.body,
+            request.META.get('HTTP_STRIPE_SIGNATURE', ''),
+            settings.STRIPE_WEBHOOK_SECRET
+        )
+    except (ValueError, stripe.error.SignatureVerificationError):
+        logger.warning("Rejected Stripe webhook with invalid payload or signature")
+        return HttpResponse(status=400)
+
+    if event['type'] == 'checkout.session.completed':
+        session = event['data']['object']
+        if session.get('payment_status') == 'paid':
+            try:
+                credits = credits_for_session(session)
+            except ValueError:
+                # Stripe would not retry a 2xx, so keep a failed purchase on record for support to resolve
+                logger.error("Checkout session %s paid %s, which matches no credit package",
+                             session['id'], session['amount_total'])
+                Transaction.objects.get_or_create(
+                    stripe_payment_id=session['id'],
+                    status='failed',
+                    defaults={
+                        'user_id': int(session['metadata']['user_id']),
+                        'transaction_type': 'purchase',
+                        'amount': session['amount_total'],
+                        'credits': 0,
+                    }
+                )
+                return HttpResponse(status=200)
+            credit_purchase_task.delay(
+                int(session['metadata']['user_id']),
+                session['id'],
+                session['amount_total'],
+                credits
+            )
+
+    return HttpResponse(status=200)
 
 @api_view(['POST'])
+@renderer_classes([ORJSONRenderer])
 def token_refresh_view(request):
     """Refresh the user's access token."""
-    try:
-        refresh_token = request.data.get('refresh')
-        if not refresh_token:
-            return Response({'error': 'Refresh token is required'}, status=400)
+    serializer = RefreshTokenSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({'error': 'Refresh token is required'}, status=400)
+    refresh_token = serializer.validated_data['refresh']
 
-        refresh = RefreshToken(refresh_token)
-        access_token = str(refresh.access_token)
+    try:
+        refresh = CachedRefreshToken(refresh_token)
+    except TokenError:
+        logger.info("Rejected invalid or expired refresh token")
+        return Response({'error': 'Invalid or expired refresh token'}, status=401)
 
-        return Response({
-            'access': access_token
-        })
-    except Exception as e:
-        return Response({'error': str(e)}, status=400)
+    return Response({
+        'access': refresh.issue_access_token()
+    })
 
 @rate_limit(endpoint_type='AUTH')
 @api_view(['POST'])
@@ -1375,7 +1177,7 @@ def request_password_reset(request):
         try:
             send_password_reset_email(user, reset_url)
         except Exception as e:
-            logger.error(f"Failed to send password reset email: {str(e)}")
+            logger.error("Failed to send password reset email: %s", e)
             return Response(
                 {"error": "Failed to send password reset email. Please try again later."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -1386,7 +1188,7 @@ def request_password_reset(request):
             status=status.HTTP_200_OK
         )
     except Exception as e:
-        logger.error(f"Password reset request error: {str(e)}")
+        logger.error("Password reset request error: %s", e)
         return Response(
             {"error": "An error occurred. Please try again."},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -1449,7 +1251,7 @@ def reset_password(request):
             status=status.HTTP_200_OK
         )
     except Exception as e:
-        logger.error(f"Password reset error: {str(e)}")
+        logger.error("Password reset error: %s", e)
         return Response(
             {"error": "server_error", "message": "An error occurred. Please try again."},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -1464,7 +1266,7 @@ def user_profile(request):
     """
     try:
         if request.method == "GET":
-            profile = Profile.objects.get(user=request.user)
+            profile = request.user.profile
             return Response({
                 "username": request.user.username,
                 "email": request.user.email,
@@ -1478,7 +1280,7 @@ def user_profile(request):
         elif request.method == "PATCH":
             data = request.data
             user = request.user
-            profile = Profile.objects.get(user=user)
+            profile = user.profile
             
             # Update username if provided and available
             new_username = data.get("username")
@@ -1514,7 +1316,7 @@ def user_profile(request):
             status=status.HTTP_404_NOT_FOUND
         )
     except Exception as e:
-        logger.error(f"Profile operation error: {str(e)}")
+        logger.error("Profile operation error: %s", e)
         return Response(
             {"error": "An error occurred. Please try again."},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
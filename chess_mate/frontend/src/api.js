@@ -94,6 +94,34 @@ api.interceptors.request.use(
   }
 );
 
+// Background jobs (game analysis, game imports) answer 202 with a status URL to poll
+const JOB_POLL_INTERVAL_MS = 1000;
+const JOB_MAX_POLLS = 120;
+
+// Poll a job's status URL until it settles and return the job result
+export const waitForJob = async (statusUrl, accessToken, onProgress = null, maxPolls = JOB_MAX_POLLS) => {
+  for (let attempt = 0; attempt < maxPolls; attempt++) {
+    await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    const response = await fetch(`${API_BASE_URL.replace(/\/api$/, '')}${statusUrl}`, {
+      headers: { 'Authorization': `Bearer ${accessToken}` }
+    });
+    const data = await response.json();
+    if (!response.ok) {
+      throw new Error(data.error || 'Failed to check job status');
+    }
+    if (onProgress && data.progress) {
+      onProgress(data.progress);
+    }
+    if (data.status === 'completed') {
+      return data.result;
+    }
+    if (data.status === 'failed') {
+      throw new Error(data.error || 'Job failed');
+    }
+  }
+  throw new Error('This is taking longer than expected. Please check back shortly.');
+};
+
 // API functions
 
 // Register a new user
@@ -165,6 +193,9 @@ export const fetchExternalGames = async (platform, username, gameType) => {
 export const analyzeSpecificGame = async (gameId) => {
   try {
     const response = await api.post(`/game/${gameId}/analysis/`);
+    if (response.status === 202) {
+      return await waitForJob(response.data.status_url, localStorage.getItem("access_token"));
+    }
     return response.data;
   } catch (error) {
     throw error.response ? error.response.data : error.message;
@@ -175,6 +206,9 @@ export const analyzeSpecificGame = async (gameId) => {
 export const analyzeBatchGames = async (numGames) => {
   try {
     const response = await api.post("/games/batch-analyze/", { num_games: parseInt(numGames, 10) });
+    if (response.status === 202) {
+      return await waitForJob(response.data.status_url, localStorage.getItem("access_token"));
+    }
     return response.data;
   } catch (error) {
     throw error.response ? error.response.data : error.message;
@@ -184,7 +218,7 @@ export const analyzeBatchGames = async (numGames) => {
 // Fetch analysis for a game
 export const fetchGameAnalysis = async (gameId) => {
   try {
-    const response = await api.get(`/game/${gameId}/analysis/`);
+    const response = await api.get(`/games/${gameId}/analysis/`);
     return response.data.analysis;
   } catch (error) {
     throw error.response ? error.response.data : error.message;
@@ -194,7 +228,11 @@ export const fetchGameAnalysis = async (gameId) => {
 // Fetch feedback for a specific game
 export const fetchGameFeedback = async (gameId) => {
   try {
-    const response = await api.get(`/feedback/${gameId}/`);
+    const response = await api.post(`/feedback/${gameId}/`);
+    if (response.status === 202) {
+      const result = await waitForJob(response.data.status_url, localStorage.getItem("access_token"));
+      return result.feedback;
+    }
     return response.data.feedback;
   } catch (error) {
     throw error.response ? error.response.data : error.message;
@@ -1,8 +1,10 @@
 import React, { useState, useEffect } from 'react';
 import { toast } from 'react-hot-toast';
 import { Loader2 } from 'lucide-react';
+import { API_BASE_URL, waitForJob } from '../api';
 
-const API_BASE_URL = 'http://localhost:8000/api';
+// Allow roughly a minute per game before giving up on polling a batch job
+const POLLS_PER_GAME = 60;
 
 const BatchAnalysis = () => {
   const [numGames, setNumGames] = useState(10);
@@ -45,40 +47,26 @@ const BatchAnalysis = () => {
       // Initial estimate: 30 seconds per game
       setEstimatedTime(parseInt(numGames) * 30);
 
+      const accessToken = JSON.parse(localStorage.getItem('tokens')).access;
       const response = await fetch(`${API_BASE_URL}/games/batch-analyze/`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
-          'Authorization': `Bearer ${JSON.parse(localStorage.getItem('tokens')).access}`
+          'Authorization': `Bearer ${accessToken}`
         },
         body: JSON.stringify({ num_games: parseInt(numGames) })
       });
 
+      const data = await response.json();
       if (!response.ok) {
-        const data = await response.json();
         throw new Error(data.error || 'Failed to analyze games');
       }
 
-      const reader = response.body.getReader();
-      const decoder = new TextDecoder();
-
-      while (true) {
-        const { value, done } = await reader.read();
-        if (done) break;
-
-        const chunk = decoder.decode(value);
-        try {
-          const data = JSON.parse(chunk);
-          if (data.progress) {
-            setProgress(data.progress);
-          }
-        } catch (e) {
-          console.error('Error parsing progress update:', e);
-        }
-      }
-
-      const data = await response.json();
-      setResults(data.results);
+      // The analysis runs in the background; poll the job and show its progress
+      const result = response.status === 202
+        ? await waitForJob(data.status_url, accessToken, setProgress, parseInt(numGames) * POLLS_PER_GAME)
+        : data;
+      setResults(result.results);
       toast.success('Batch analysis completed!');
     } catch (error) {
       console.error('Error during batch analysis:', error);
@@ -2,8 +2,7 @@ import React, { useState, useContext } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { UserContext } from '../contexts/UserContext';
 import { toast } from 'react-hot-toast';
-
-const API_BASE_URL = 'http://localhost:8000/api';
+import { API_BASE_URL, waitForJob } from '../api';
 
 const FetchGames = () => {
   const [platform, setPlatform] = useState('chess.com');
@@ -45,12 +44,22 @@ const FetchGames = () => {
         })
       });
 
-      const data = await response.json();
+      let data = await response.json();
 
       if (!response.ok) {
         throw new Error(data.error || 'Failed to fetch games');
       }
 
+      // The import runs in the background; wait for it before showing the games
+      if (response.status === 202) {
+        toast.loading('Importing games...', { id: 'fetch-games' });
+        try {
+          data = await waitForJob(data.status_url, accessToken);
+        } finally {
+          toast.dismiss('fetch-games');
+        }
+      }
+
       toast.success(data.message);
       navigate('/games');
     } catch (error) {
@@ -2,8 +2,7 @@ import React, { useState, useEffect } from "react";
 import { useParams } from "react-router-dom";
 import { toast } from "react-hot-toast";
 import { Loader2 } from "lucide-react";
-
-const API_BASE_URL = "http://localhost:8000/api";
+import { API_BASE_URL, waitForJob } from "../api";
 
 const GameAnalysis = () => {
   const { gameId } = useParams();
@@ -24,6 +23,7 @@ const GameAnalysis = () => {
       }
 
       const response = await fetch(`${API_BASE_URL}/game/${gameId}/analysis/`, {
+        method: "POST",
         headers: {
           "Authorization": `Bearer ${accessToken}`
         }
@@ -34,7 +34,11 @@ const GameAnalysis = () => {
         throw new Error(data.error || "Failed to fetch analysis");
       }
 
-      const data = await response.json();
+      let data = await response.json();
+      // Games without stored analysis are queued; wait for the job result
+      if (response.status === 202) {
+        data = await waitForJob(data.status_url, accessToken);
+      }
       setAnalysis(data);
     } catch (error) {
       console.error("Error fetching analysis:", error);
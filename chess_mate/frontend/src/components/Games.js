@@ -2,8 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { Filter, Search } from 'lucide-react';
 import { toast } from 'react-hot-toast';
-
-const API_BASE_URL = 'http://localhost:8000/api';
+import { API_BASE_URL, waitForJob } from '../api';
 
 const Games = () => {
   const [games, setGames] = useState([]);
@@ -62,8 +61,8 @@ const Games = () => {
         );
       }
       // Then apply analysis filter
-      if (filter === 'analyzed') return game.analysis;
-      if (filter === 'unanalyzed') return !game.analysis;
+      if (filter === 'analyzed') return game.has_analysis;
+      if (filter === 'unanalyzed') return !game.has_analysis;
       return true;
     })
     .sort((a, b) => {
@@ -198,7 +197,7 @@ const Games = () => {
                           </span>
                         </td>
                         <td className="whitespace-nowrap px-3 py-4 text-sm text-gray-500">
-                          {game.analysis ? (
+                          {game.has_analysis ? (
                             <span className="inline-flex items-center px-2.5 py-0.5 rounded-full text-xs font-medium bg-green-100 text-green-800">
                               Analyzed
                             </span>
@@ -238,18 +237,23 @@ const Games = () => {
                                   })
                                 });
 
-                                const data = await response.json();
+                                let data = await response.json();
 
                                 if (!response.ok) {
                                   toast.error(data.error || 'Failed to analyze game', { id: toastId });
                                   throw new Error(data.error || 'Failed to analyze game');
                                 }
 
+                                // New analyses run in the background; wait for the job to finish
+                                if (response.status === 202) {
+                                  data = await waitForJob(data.status_url, accessToken);
+                                }
+
                                 // Update the game in the local state
                                 setGames(prevGames => 
                                   prevGames.map(g => 
                                     g.id === game.id 
-                                      ? { ...g, analysis: data.analysis }
+                                      ? { ...g, has_analysis: true }
                                       : g
                                   )
                                 );
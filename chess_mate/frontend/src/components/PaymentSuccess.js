@@ -13,6 +13,25 @@ const PaymentSuccess = () => {
   const [sessionProcessed, setSessionProcessed] = useState(false);
   const { setCredits, fetchCredits } = useContext(UserContext);
   const MAX_RETRIES = 3;
+  const POLL_INTERVAL_MS = 1000;
+  const MAX_POLLS = 30;
+
+  const pollPurchaseStatus = async (statusUrl, accessToken) => {
+    for (let attempt = 0; attempt < MAX_POLLS; attempt++) {
+      await new Promise(resolve => setTimeout(resolve, POLL_INTERVAL_MS));
+      const response = await fetch(`${API_BASE_URL.replace(/\/api$/, '')}${statusUrl}`, {
+        headers: { 'Authorization': `Bearer ${accessToken}` }
+      });
+      const data = await response.json();
+      if (data.status === 'completed') {
+        return data;
+      }
+      if (data.status === 'failed') {
+        throw new Error(data.error || 'Failed to confirm purchase');
+      }
+    }
+    throw new Error('Purchase confirmation is taking longer than expected. Please check your credits shortly.');
+  };
 
   useEffect(() => {
     const confirmPayment = async () => {
@@ -61,7 +80,12 @@ const PaymentSuccess = () => {
           throw new Error('Invalid response from server');
         }
 
-        if (response.ok && data.success) {
+        // The confirmation is processed in the background; poll until it settles
+        if (response.status === 202) {
+          data = await pollPurchaseStatus(data.status_url, accessToken);
+        }
+
+        if (response.ok && (data.success || data.status === 'completed')) {
           setSessionProcessed(true);
           // Update credits in context
           setCredits(data.credits);